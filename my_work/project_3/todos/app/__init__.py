@@ -0,0 +1,4 @@
+import time
+
+# When the app started importing, for reporting its startup time
+IMPORT_START = time.perf_counter()
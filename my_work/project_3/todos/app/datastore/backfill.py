@@ -0,0 +1,183 @@
+"""Resumable backfills of large tables, in batches ordered by an integer key.
+
+Each batch updates the rows after the last key processed, and commits with
+the backfill's checkpoint in `backfill_checkpoints`, so an interrupted
+backfill resumes from its last committed batch when run again. The pause
+between batches throttles the load on the database.
+
+Run a backfill from a revision with `online_migrations.batched_update`, or
+from the command line with `python -m scripts.alembic backfill --help`.
+"""
+import logging
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger("alembic.backfill")
+
+BATCH_SIZE = 1000
+# Pause between batches, leaving the database time for other traffic
+BATCH_SLEEP = 0.1
+CHECKPOINT_TABLE = "backfill_checkpoints"
+
+
+class Backfill(NamedTuple):
+    """Set `set_sql` on the table's rows matching `where_sql`.
+
+    The name identifies the backfill's checkpoint, e.g.
+    `Backfill("users_phone", "users", "phone_number = ''", "phone_number IS NULL")`
+    """
+
+    name: str
+    table: str
+    set_sql: str
+    where_sql: str | None = None
+    key: str = "id"
+
+
+def default_name(table: str, set_sql: str, where_sql: str | None = None) -> str:
+    """Name a backfill after its table and SQL.
+
+    Other backfills of the same table then keep checkpoints of their own,
+    instead of resuming from, or skipping as completed, this one's.
+    """
+    where = f" WHERE {where_sql}" if where_sql else ""
+    return f"{table} SET {set_sql}{where}"
+
+
+class BackfillProgress(NamedTuple):
+    rows: int
+    last_key: int | None
+    rows_per_second: float = 0.0
+    completed: bool = False
+
+
+def log_progress(progress: BackfillProgress) -> None:
+    logger.info(
+        "Backfilled %d rows up to key %s, %.0f rows/s",
+        progress.rows,
+        progress.last_key,
+        progress.rows_per_second,
+    )
+
+
+def run_backfill(
+    engine: Engine,
+    backfill: Backfill,
+    batch_size: int = BATCH_SIZE,
+    sleep: float = BATCH_SLEEP,
+    checkpoint: bool = True,
+    report: Callable[[BackfillProgress], None] = log_progress,
+) -> BackfillProgress:
+    """Run the backfill to completion, resuming from its checkpoint.
+
+    Without `checkpoint`, the backfill starts from the first row and keeps
+    no progress, e.g. for a migration on a table without a checkpoint yet.
+    """
+    where = f" AND ({backfill.where_sql})" if backfill.where_sql else ""
+    select_batch = text(
+        f"SELECT max({backfill.key}), count(*) FROM (SELECT {backfill.key}"
+        f" FROM {backfill.table} WHERE {backfill.key} > :after{where}"
+        f" ORDER BY {backfill.key} LIMIT :limit) AS batch"
+    )
+    update_batch = text(
+        f"UPDATE {backfill.table} SET {backfill.set_sql}"
+        f" WHERE {backfill.key} > :after AND {backfill.key} <= :last{where}"
+    )
+
+    with engine.begin() as connection:
+        saved = get_checkpoint(connection, backfill.name) if checkpoint else None
+        if saved and saved.completed:
+            return saved
+        min_key = connection.execute(
+            text(f"SELECT min({backfill.key}) FROM {backfill.table}")
+        ).scalar()
+    start_rows = saved.rows if saved else 0
+    after = saved.last_key if saved else None
+    if after is None and min_key is not None:
+        after = min_key - 1
+    rows = start_rows
+    start = time.perf_counter()
+
+    while True:
+        with engine.begin() as connection:
+            count = 0
+            if after is not None:
+                last, count = connection.execute(
+                    select_batch, {"after": after, "limit": batch_size}
+                ).one()
+            if count:
+                connection.execute(update_batch, {"after": after, "last": last})
+                after = last
+                rows += count
+            progress = BackfillProgress(
+                rows=rows,
+                last_key=after,
+                rows_per_second=(rows - start_rows) / (time.perf_counter() - start),
+                completed=not count,
+            )
+            if checkpoint:
+                _save_checkpoint(connection, backfill.name, progress)
+        if progress.completed:
+            return progress
+        report(progress)
+        time.sleep(sleep)
+
+
+def get_checkpoint(connection: Connection, name: str) -> BackfillProgress | None:
+    """Get the backfill's progress, as of its last committed batch."""
+    row = connection.execute(
+        text(
+            f"SELECT row_count, last_key, completed FROM {CHECKPOINT_TABLE}"
+            " WHERE name = :name"
+        ),
+        {"name": name},
+    ).one_or_none()
+    if row is None:
+        return None
+    return BackfillProgress(
+        rows=row.row_count, last_key=row.last_key, completed=row.completed
+    )
+
+
+def reset_checkpoint(engine: Engine, name: str) -> None:
+    """Forget the backfill's progress, so it runs again from the start."""
+    with engine.begin() as connection:
+        connection.execute(
+            text(f"DELETE FROM {CHECKPOINT_TABLE} WHERE name = :name"),
+            {"name": name},
+        )
+
+
+# ------------ Helpers ------------
+def _save_checkpoint(
+    connection: Connection, name: str, progress: BackfillProgress
+) -> None:
+    values = {
+        "name": name,
+        "last_key": progress.last_key,
+        "row_count": progress.rows,
+        "completed": progress.completed,
+        "updated_at": datetime.now(timezone.utc).replace(tzinfo=None),
+    }
+    updated = connection.execute(
+        text(
+            f"UPDATE {CHECKPOINT_TABLE} SET last_key = :last_key,"
+            " row_count = :row_count, completed = :completed,"
+            " updated_at = :updated_at WHERE name = :name"
+        ),
+        values,
+    )
+    if not updated.rowcount:
+        connection.execute(
+            text(
+                f"INSERT INTO {CHECKPOINT_TABLE}"
+                " (name, last_key, row_count, completed, updated_at)"
+                " VALUES (:name, :last_key, :row_count, :completed, :updated_at)"
+            ),
+            values,
+        )
@@ -1,6 +1,7 @@
+from datetime import datetime, timezone
 from typing import Annotated
 
-from sqlalchemy import ForeignKey, String
+from sqlalchemy import ForeignKey, Index, String
 from sqlalchemy.orm import (
     DeclarativeBase,
     Mapped,
@@ -13,7 +14,8 @@ from app.permissions import Role
 
 IntPK = Annotated[int, mapped_column(primary_key=True)]
 UniqueStr = Annotated[str, mapped_column(unique=True)]
-UsersFk = Annotated[int, mapped_column(ForeignKey("users.id"))]
+# Deleted by the database with their user, see `User.todos`
+UsersFk = Annotated[int, mapped_column(ForeignKey("users.id", ondelete="CASCADE"))]
 str100 = Annotated[str, 100]
 
 
@@ -25,7 +27,21 @@ class Base(DeclarativeBase):
     }
 
 
-class Todo(Base):
+class SoftDeleteMixin:
+    """Mixin for models deleted by setting deleted_at.
+
+    Soft deleted rows are left out of ORM queries, see `database.py`, and
+    removed later in batches by `datastore.purge`.
+    """
+
+    deleted_at: Mapped[datetime | None] = mapped_column(index=True)
+
+    def soft_delete(self) -> None:
+        """Mark the row deleted, committed with the session."""
+        self.deleted_at = datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class Todo(Base, SoftDeleteMixin):
     """Todo model
 
     description: Annotated[str, Field(min_length=3, max_length=100)]
@@ -33,6 +49,8 @@ class Todo(Base):
     """
 
     __tablename__ = "todos"
+    # Lists a user's todos, in id order for keyset pagination
+    __table_args__ = (Index("ix_todos_owner_id_id", "owner_id", "id"),)
 
     id: Mapped[IntPK]
     title: Mapped[str]
@@ -44,7 +62,15 @@ class Todo(Base):
     owner: Mapped["User"] = relationship("User", back_populates="todos")
 
 
-class User(Base, mixins.AuthUserMixin):
+class TodoId(Base):
+    """Todo id allocation model, keeping ids unique across todo shards"""
+
+    __tablename__ = "todo_ids"
+
+    id: Mapped[IntPK]
+
+
+class User(Base, mixins.AuthUserMixin, SoftDeleteMixin):
     """User model"""
 
     __tablename__ = "users"
@@ -60,6 +86,69 @@ class User(Base, mixins.AuthUserMixin):
     role: Mapped[Role]
     is_active: Mapped[bool] = mapped_column(default=False)
 
+    # The database deletes the todos, without loading them into the session
     todos: Mapped[list[Todo]] = relationship(
-        "Todo", back_populates="owner", cascade="all, delete"
+        "Todo", back_populates="owner", cascade="all, delete", passive_deletes=True
+    )
+    refresh_tokens: Mapped[list["RefreshToken"]] = relationship(
+        "RefreshToken", back_populates="user", cascade="all, delete"
     )
+    api_keys: Mapped[list["ApiKey"]] = relationship(
+        "ApiKey", back_populates="user", cascade="all, delete"
+    )
+
+
+class RefreshToken(Base):
+    """Refresh token model
+
+    Only the SHA-256 digest of the token is stored. Tokens rotated from the
+    same login share a family_id.
+    """
+
+    __tablename__ = "refresh_tokens"
+
+    id: Mapped[IntPK]
+    token_hash: Mapped[UniqueStr]
+    family_id: Mapped[str] = mapped_column(index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    expires_at: Mapped[datetime]
+    used_at: Mapped[datetime | None]
+    revoked: Mapped[bool] = mapped_column(default=False)
+
+    user: Mapped[User] = relationship("User", back_populates="refresh_tokens")
+
+
+class ApiKey(Base):
+    """API key model
+
+    Keys are looked up by their unique prefix, and only the SHA-256 digest
+    of the whole key is stored.
+    """
+
+    __tablename__ = "api_keys"
+
+    id: Mapped[IntPK]
+    name: Mapped[str]
+    prefix: Mapped[UniqueStr]
+    key_hash: Mapped[str]
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    created_at: Mapped[datetime]
+    revoked: Mapped[bool] = mapped_column(default=False)
+
+    user: Mapped[User] = relationship("User", back_populates="api_keys")
+
+
+class BackfillCheckpoint(Base):
+    """Backfill checkpoint model
+
+    Progress of a backfill by name, as of its last committed batch, so an
+    interrupted backfill resumes where it stopped. See `datastore.backfill`.
+    """
+
+    __tablename__ = "backfill_checkpoints"
+
+    name: Mapped[str] = mapped_column(primary_key=True)
+    last_key: Mapped[int | None]
+    row_count: Mapped[int]
+    completed: Mapped[bool] = mapped_column(default=False)
+    updated_at: Mapped[datetime]
@@ -0,0 +1,146 @@
+"""Optional group commit of writes, for single-writer SQLite deployments.
+
+SQLite commits one transaction at a time, so concurrent requests each
+committing their own write queue up on the database lock. With
+GROUP_COMMIT=true, writes are instead queued to a single writer task, which
+applies each batch of queued writes in one session and commits it once.
+Each request awaits the result of its own write.
+
+A write is a function of a session, which must only touch that session so
+it can be re-run: when any write of a batch fails with a database or web
+error, the batch is rolled back and its writes are re-run and committed one
+at a time, so only the failing write raises. Other errors are bugs, which
+re-running won't fix, so they fail the whole batch. A write is still
+applied if its request is cancelled.
+"""
+import asyncio
+import logging
+import os
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.datastore.database import SessionLocal
+from app.web import errors
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+Write = Callable[[Session], Any]
+
+GROUP_COMMIT = os.environ.get("GROUP_COMMIT", "false").lower() == "true"
+# Time the writer waits for more writes after the first of a batch
+BATCH_WINDOW = float(os.environ.get("GROUP_COMMIT_WINDOW_MS", "2")) / 1000
+MAX_BATCH_SIZE = 500
+# Failures of a single write, after which the rest of its batch can be re-run
+WRITE_ERRORS = (SQLAlchemyError, errors.WebError)
+
+
+class GroupCommitWriter:
+    """Apply queued writes in batches, with one commit per batch."""
+
+    def __init__(
+        self,
+        session_maker: sessionmaker[Session],
+        window: float = BATCH_WINDOW,
+        max_batch_size: int = MAX_BATCH_SIZE,
+    ) -> None:
+        self.session_maker = session_maker
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue[tuple[Write, asyncio.Future[Any]]]
+        self._task: asyncio.Task[None] | None = None
+
+    async def submit(self, write: Callable[[Session], T]) -> T:
+        """Queue the write, and wait for its batch to be committed."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop or not self._task or self._task.done():
+            # The writer lives on the event loop serving the requests
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run(self._queue))
+        future: asyncio.Future[T] = loop.create_future()
+        await self._queue.put((write, future))
+        return await future
+
+    async def close(self) -> None:
+        """Stop the writer task."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, queue: asyncio.Queue[tuple[Write, asyncio.Future[Any]]]):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            await asyncio.sleep(self.window)
+            while len(batch) < self.max_batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            writes = [write for write, _ in batch]
+            (outcomes,) = await asyncio.gather(
+                loop.run_in_executor(None, self._commit_batch, writes),
+                return_exceptions=True,
+            )
+            if isinstance(outcomes, BaseException):
+                logger.error(
+                    "Group commit of %d writes failed", len(writes), exc_info=outcomes
+                )
+                outcomes = [(None, outcomes)] * len(writes)
+            for (_, future), (result, error) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if error:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    def _commit_batch(
+        self, writes: list[Write]
+    ) -> list[tuple[Any, BaseException | None]]:
+        """Apply and commit the writes, returning each one's result or error."""
+        if len(writes) > 1:
+            try:
+                with self.session_maker() as session:
+                    results = [write(session) for write in writes]
+                    session.commit()
+                return [(result, None) for result in results]
+            except WRITE_ERRORS:
+                # Expected when a write fails, e.g. on a missing todo
+                logger.warning(
+                    "Group commit of %d writes failed, retrying one at a time",
+                    len(writes),
+                    exc_info=True,
+                )
+        return [self._commit_write(write) for write in writes]
+
+    def _commit_write(self, write: Write) -> tuple[Any, BaseException | None]:
+        try:
+            with self.session_maker() as session:
+                result = write(session)
+                session.commit()
+            return result, None
+        except WRITE_ERRORS as e:
+            return None, e
+
+
+writer = GroupCommitWriter(SessionLocal) if GROUP_COMMIT else None
+
+
+async def run_write(db: Session, write: Callable[[Session], T]) -> T:
+    """Apply and commit the write, through the group commit writer if enabled.
+
+    Without the writer, the write is applied to the request's session and
+    committed. With it, the write's objects belong to the writer's session,
+    so merge them into the request's session to lazy load relationships.
+    """
+    if writer is None:
+        result = write(db)
+        db.commit()
+        return result
+    # End the request's transaction, so its next reads see the write
+    db.commit()
+    return await writer.submit(write)
@@ -0,0 +1,276 @@
+"""Helpers for migrating large tables without stalling traffic.
+
+Use them in revisions in place of the plain `op` calls that lock a table
+for as long as they run, e.g.
+
+    from app.datastore import online_migrations
+
+    def upgrade() -> None:
+        online_migrations.create_index_concurrently(
+            "ix_todos_owner_id", "todos", ["owner_id"]
+        )
+
+The lock names and behaviours are PostgreSQL's. Other databases fall back
+to the plain operations. Preview an upgrade's locks with
+`python -m scripts.alembic upgrade --dry-run-plan`.
+"""
+import re
+from collections.abc import Sequence
+from typing import Any, NamedTuple
+
+from alembic import op
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+
+from app.datastore import backfill
+
+
+def create_index_concurrently(
+    index_name: str, table_name: str, columns: Sequence[str], **kw: Any
+) -> None:
+    """Create an index without blocking writes to the table.
+
+    On PostgreSQL the index is built outside the migration's transaction.
+    A failed build leaves an invalid index, which must be dropped before
+    retrying.
+    """
+    if not _is_postgresql():
+        op.create_index(index_name, table_name, columns, **kw)
+        return
+    with op.get_context().autocommit_block():
+        op.create_index(
+            index_name, table_name, columns, postgresql_concurrently=True, **kw
+        )
+
+
+def drop_index_concurrently(index_name: str, table_name: str) -> None:
+    """Drop an index without blocking reads and writes to the table."""
+    if not _is_postgresql():
+        op.drop_index(index_name, table_name=table_name)
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True)
+
+
+def replace_foreign_key(
+    constraint_name: str,
+    source_table: str,
+    referent_table: str,
+    local_cols: list[str],
+    remote_cols: list[str],
+    **kw: Any,
+) -> None:
+    """Replace a foreign key with a new one, e.g. to change its `ondelete`.
+
+    On PostgreSQL the new key is added NOT VALID, which only locks the
+    tables briefly, then validated outside the migration's transaction
+    without blocking writes. Other databases alter the table in batch mode,
+    where SQLite copies it to a new table. Unnamed keys are given
+    PostgreSQL's default names there, e.g. "todos_owner_id_fkey". Batch
+    mode reflects the table, so offline (`--sql`) only a comment is emitted.
+    """
+    if not _is_postgresql() and op.get_context().as_sql:
+        op.execute(
+            f"-- Recreate {source_table} with foreign key {constraint_name},"
+            " which needs a live database"
+        )
+        return
+    if not _is_postgresql():
+        naming_convention = {"fk": "%(table_name)s_%(column_0_name)s_fkey"}
+        with op.batch_alter_table(
+            source_table, naming_convention=naming_convention
+        ) as batch_op:
+            batch_op.drop_constraint(constraint_name, type_="foreignkey")
+            batch_op.create_foreign_key(
+                constraint_name, referent_table, local_cols, remote_cols, **kw
+            )
+        return
+    op.drop_constraint(constraint_name, source_table, type_="foreignkey")
+    op.create_foreign_key(
+        constraint_name,
+        source_table,
+        referent_table,
+        local_cols,
+        remote_cols,
+        postgresql_not_valid=True,
+        **kw,
+    )
+    with op.get_context().autocommit_block():
+        op.execute(f"ALTER TABLE {source_table} VALIDATE CONSTRAINT {constraint_name}")
+
+
+def set_lock_timeout(timeout_ms: int) -> None:
+    """Fail the migration if it waits longer than this for a lock.
+
+    DDL waiting on a lock queues every later query of the table behind it,
+    so failing and retrying is better than waiting on a long transaction.
+    """
+    if _is_postgresql():
+        op.execute(f"SET LOCAL lock_timeout = '{int(timeout_ms)}ms'")
+
+
+def batched_update(
+    table_name: str,
+    set_sql: str,
+    where_sql: str | None = None,
+    key: str = "id",
+    batch_size: int = backfill.BATCH_SIZE,
+    sleep: float = backfill.BATCH_SLEEP,
+    name: str | None = None,
+) -> None:
+    """Update the table's rows in batches ordered by `key`.
+
+    Each batch commits on its own, so row locks are only held briefly, and
+    the pause between batches throttles the load. With a `name`, progress
+    is checkpointed, and rerunning a failed upgrade resumes the backfill.
+    Offline (`--sql`), a single UPDATE is emitted instead.
+
+    e.g. `batched_update("users", "phone_number = ''", "phone_number IS NULL")`
+    """
+    if op.get_context().as_sql:
+        where = f" AND ({where_sql})" if where_sql else ""
+        op.execute(f"UPDATE {table_name} SET {set_sql} WHERE TRUE{where}")
+        return
+    with op.get_context().autocommit_block():
+        backfill.run_backfill(
+            op.get_bind().engine,
+            backfill.Backfill(
+                name=name or backfill.default_name(table_name, set_sql, where_sql),
+                table=table_name,
+                set_sql=set_sql,
+                where_sql=where_sql,
+                key=key,
+            ),
+            batch_size=batch_size,
+            sleep=sleep,
+            checkpoint=name is not None,
+        )
+
+
+# ----------- Lock Plan -----------
+class LockImpact(NamedTuple):
+    """Locks a statement takes, and what it blocks while it runs."""
+
+    revision: str
+    statement: str
+    table: str | None
+    lock: str
+    blocks: str
+    duration: str
+    rows: int | None = None
+
+
+# (pattern, lock, blocks, duration), the first match applies
+LOCK_RULES = [
+    (
+        r"CREATE\s+(UNIQUE\s+)?INDEX\s+CONCURRENTLY",
+        "SHARE UPDATE EXCLUSIVE",
+        "nothing",
+        "index build",
+    ),
+    (r"CREATE\s+(UNIQUE\s+)?INDEX", "SHARE", "writes", "index build"),
+    (r"DROP\s+INDEX\s+CONCURRENTLY", "SHARE UPDATE EXCLUSIVE", "nothing", "brief"),
+    (r"DROP\s+INDEX", "ACCESS EXCLUSIVE", "reads and writes", "brief"),
+    (r"CREATE\s+TABLE", "none", "nothing", "brief"),
+    (r"ALTER\s+TABLE.*\sTYPE\s", "ACCESS EXCLUSIVE", "reads and writes", "rewrite"),
+    (
+        r"ALTER\s+TABLE.*SET\s+NOT\s+NULL",
+        "ACCESS EXCLUSIVE",
+        "reads and writes",
+        "scan",
+    ),
+    (r"ALTER\s+TABLE.*NOT\s+VALID", "SHARE ROW EXCLUSIVE", "writes", "brief"),
+    (
+        r"ALTER\s+TABLE.*VALIDATE\s+CONSTRAINT",
+        "SHARE UPDATE EXCLUSIVE",
+        "nothing",
+        "scan",
+    ),
+    (r"ALTER\s+TABLE.*FOREIGN\s+KEY", "SHARE ROW EXCLUSIVE", "writes", "scan"),
+    (
+        r"ALTER\s+TABLE.*ADD\s+(CONSTRAINT\s+\w+\s+)?(UNIQUE|CHECK|PRIMARY)",
+        "ACCESS EXCLUSIVE",
+        "reads and writes",
+        "scan",
+    ),
+    (
+        r"ALTER\s+TABLE.*DEFAULT\s+\w+\(",
+        "ACCESS EXCLUSIVE",
+        "reads and writes",
+        "rewrite",
+    ),
+    (r"ALTER\s+TABLE", "ACCESS EXCLUSIVE", "reads and writes", "brief"),
+    (r"DROP\s+TABLE", "ACCESS EXCLUSIVE", "reads and writes", "brief"),
+    (r"(UPDATE|DELETE\s+FROM|INSERT\s+INTO)\s", "ROW EXCLUSIVE", "same rows", "scan"),
+]
+TABLE_PATTERN = re.compile(
+    r"\b(?:TABLE|ON|UPDATE|FROM|INTO)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?\"?(\w+)",
+    re.IGNORECASE,
+)
+REVISION_PATTERN = re.compile(r"^-- Running upgrade .*-> (\w+)", re.MULTILINE)
+SKIPPED_STATEMENTS = {"BEGIN", "COMMIT"}
+
+
+def plan_locks(sql: str, connection: Connection | None = None) -> list[LockImpact]:
+    """Estimate the locks taken by the statements of an offline upgrade.
+
+    With a connection, the row count of each table is included, which the
+    time spent scanning or rewriting it grows with.
+    """
+    impacts = []
+    revision = ""
+    row_counts: dict[str, int | None] = {}
+    for chunk in re.split(r";\s*$", sql, flags=re.MULTILINE):
+        if revisions := REVISION_PATTERN.findall(chunk):
+            revision = revisions[-1]
+        statement = " ".join(
+            line.strip()
+            for line in chunk.splitlines()
+            if line.strip() and not line.strip().startswith("--")
+        )
+        if not statement or statement.upper() in SKIPPED_STATEMENTS:
+            continue
+        table_match = TABLE_PATTERN.search(statement)
+        table = table_match.group(1) if table_match else None
+        if table == "alembic_version":
+            continue
+        lock, blocks, duration = _match_lock_rule(statement)
+        if connection is not None and table and table not in row_counts:
+            row_counts[table] = _estimate_rows(connection, table)
+        impacts.append(
+            LockImpact(
+                revision=revision,
+                statement=statement,
+                table=table,
+                lock=lock,
+                blocks=blocks,
+                duration=duration,
+                rows=row_counts.get(table) if table else None,
+            )
+        )
+    return impacts
+
+
+# ------------ Helpers ------------
+def _is_postgresql() -> bool:
+    return op.get_context().dialect.name == "postgresql"
+
+
+def _match_lock_rule(statement: str) -> tuple[str, str, str]:
+    for pattern, lock, blocks, duration in LOCK_RULES:
+        if re.match(pattern, statement, re.IGNORECASE | re.DOTALL):
+            return lock, blocks, duration
+    return "unknown", "unknown", "unknown"
+
+
+def _estimate_rows(connection: Connection, table: str) -> int | None:
+    """Estimate the table's rows, from PostgreSQL's statistics if available."""
+    if connection.dialect.name == "postgresql":
+        query = text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table")
+        return connection.execute(query, {"table": table}).scalar()
+    try:
+        return connection.execute(text(f'SELECT count(*) FROM "{table}"')).scalar()
+    except DBAPIError:
+        # e.g. a table created earlier in the same upgrade
+        return None
@@ -0,0 +1,155 @@
+"""Background removal of soft deleted users and todos.
+
+Deletes only mark rows with `deleted_at`, so a request deleting a user with
+many todos returns at once. The purger removes the marked rows later, in
+batches of bounded size each committed on its own, so no single statement
+holds its locks for long. A user's todos are removed before the user.
+
+Set PURGE_INTERVAL=0 to disable it, e.g. to purge from a separate process
+with `purge_all`.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.datastore import db_models
+from app.datastore.database import INCLUDE_DELETED, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Seconds between purges, 0 to disable the purger
+PURGE_INTERVAL = float(os.environ.get("PURGE_INTERVAL", "60"))
+BATCH_SIZE = int(os.environ.get("PURGE_BATCH_SIZE", "1000"))
+# Pause between batches, leaving the database time for other traffic
+BATCH_SLEEP = 0.1
+
+
+class Purger:
+    """Purge soft deleted rows periodically, on the app's event loop."""
+
+    def __init__(
+        self,
+        session_maker: sessionmaker[Session],
+        interval: float = PURGE_INTERVAL,
+        batch_size: int = BATCH_SIZE,
+        sleep: float = BATCH_SLEEP,
+    ) -> None:
+        self.session_maker = session_maker
+        self.interval = interval
+        self.batch_size = batch_size
+        self.sleep = sleep
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        """Start the purger task, unless disabled."""
+        if self.interval > 0 and not self._task:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the purger task, after its current batch."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                rows = await loop.run_in_executor(None, self._purge_all)
+            except Exception:
+                logger.exception("Failed to purge soft deleted rows")
+            else:
+                if rows:
+                    logger.info("Purged %d soft deleted rows", rows)
+            await asyncio.sleep(self.interval)
+
+    def _purge_all(self) -> int:
+        return purge_all(self.session_maker, self.batch_size, self.sleep)
+
+
+def purge_all(
+    session_maker: sessionmaker[Session],
+    batch_size: int = BATCH_SIZE,
+    sleep: float = BATCH_SLEEP,
+) -> int:
+    """Purge batches until no soft deleted rows are left, returning the rows."""
+    total = 0
+    while True:
+        with session_maker() as db:
+            rows = purge_batch(db, batch_size)
+            db.commit()
+        if not rows:
+            return total
+        total += rows
+        time.sleep(sleep)
+
+
+def purge_batch(db: Session, batch_size: int = BATCH_SIZE) -> int:
+    """Delete up to about `batch_size` soft deleted rows, returning the rows.
+
+    Soft deleted todos go first. Then the todos of soft deleted users, and
+    once those are all gone, the users themselves with their tokens and keys.
+    """
+    Todo, User = db_models.Todo, db_models.User
+    todo_ids = db.scalars(
+        select(Todo.id)
+        .where(Todo.deleted_at.is_not(None))
+        .limit(batch_size)
+        .execution_options(**{INCLUDE_DELETED: True})
+    ).all()
+    if todo_ids:
+        _delete_todos(db, Todo.id.in_(todo_ids))
+        return len(todo_ids)
+
+    user_ids = db.scalars(
+        select(User.id)
+        .where(User.deleted_at.is_not(None))
+        .limit(batch_size)
+        .execution_options(**{INCLUDE_DELETED: True})
+    ).all()
+    if not user_ids:
+        return 0
+    # The users' ON DELETE CASCADE would remove all their todos in a single
+    # statement, but batches keep each transaction short, and reach the todo
+    # shards, which have no foreign key. Filtering on owner_id keeps the
+    # todo queries to the owners' shards.
+    owned_todo_ids = db.scalars(
+        select(Todo.id)
+        .where(Todo.owner_id.in_(user_ids))
+        .limit(batch_size)
+        .execution_options(**{INCLUDE_DELETED: True})
+    ).all()
+    if owned_todo_ids:
+        _delete_todos(db, Todo.owner_id.in_(user_ids), Todo.id.in_(owned_todo_ids))
+        return len(owned_todo_ids)
+
+    for model in (db_models.RefreshToken, db_models.ApiKey):
+        db.execute(
+            delete(model)
+            .where(model.user_id.in_(user_ids))
+            .execution_options(synchronize_session=False)
+        )
+    db.execute(
+        delete(User)
+        .where(User.id.in_(user_ids))
+        .execution_options(synchronize_session=False)
+    )
+    return len(user_ids)
+
+
+# ------------ Helpers ------------
+def _delete_todos(db: Session, *criteria: Any) -> None:
+    db.execute(
+        delete(db_models.Todo)
+        .where(*criteria)
+        .execution_options(synchronize_session=False)
+    )
+
+
+purger = Purger(SessionLocal)
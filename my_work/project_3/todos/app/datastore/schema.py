@@ -0,0 +1,43 @@
+"""Check the database schema against the Alembic migrations at startup.
+
+Alembic is imported on first use, keeping it off the import path of the
+app until a check runs.
+"""
+import functools
+from pathlib import Path
+
+from sqlalchemy.engine import Engine
+
+MIGRATIONS_DIR = Path(__file__).parent.parent.parent / "migrations"
+
+
+@functools.cache
+def get_head_revision() -> str | None:
+    """Get the latest revision of the migration scripts."""
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory(str(MIGRATIONS_DIR)).get_current_head()
+
+
+def get_current_revision(engine: Engine) -> str | None:
+    """Get the revision the database is migrated to."""
+    from alembic.runtime.migration import MigrationContext
+
+    with engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+
+@functools.cache
+def verify_revision(engine: Engine) -> None:
+    """Raise unless the database is migrated to the head revision.
+
+    Only checked once per engine, so later app startups in the process
+    (e.g. in tests) don't repeat it.
+    """
+    head_revision = get_head_revision()
+    current_revision = get_current_revision(engine)
+    if current_revision != head_revision:
+        raise RuntimeError(
+            f"Database is at revision {current_revision}, not {head_revision}."
+            " Run `python -m scripts.alembic upgrade`."
+        )
@@ -0,0 +1,192 @@
+"""Optional horizontal sharding of todos by owner_id.
+
+Todos live on one of several shard databases, chosen for their owner_id by
+consistent hashing, so adding a shard only moves about 1/N of the owners.
+Every other table stays on the primary database.
+
+Queries filtering on `Todo.owner_id` run on that owner's shard, and other
+todo queries fan out to every shard. Existing queries need no changes.
+Todo ids are allocated on the primary, keeping them unique across shards.
+A session commits each database separately, not atomically.
+"""
+import bisect
+import hashlib
+from collections.abc import Iterable
+from typing import Any
+
+from sqlalchemy import Column, Index, MetaData, Table, event, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import Mapper, ORMExecuteState, Session, sessionmaker
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import (
+    BinaryExpression,
+    BindParameter,
+    BooleanClauseList,
+    ColumnElement,
+    Grouping,
+)
+
+from app.datastore import db_models
+
+PRIMARY_SHARD = "primary"
+# Session.info key listing the todo shard names
+TODO_SHARDS = "todo_shards"
+# Points per shard on the ring, evening out the owners per shard
+VIRTUAL_NODES = 100
+
+
+class TodoShardedSession(ShardedSession):
+    """Session routing todos to their owner's shard."""
+
+
+class ShardRing:
+    """Consistent hash ring mapping owner ids to shard names."""
+
+    def __init__(self, shard_names: Iterable[str], virtual_nodes: int = VIRTUAL_NODES):
+        points = sorted(
+            (_hash(f"{name}#{index}"), name)
+            for name in shard_names
+            for index in range(virtual_nodes)
+        )
+        self.hashes = [point for point, _ in points]
+        self.names = [name for _, name in points]
+
+    def get_shard(self, owner_id: int) -> str:
+        """Get the shard at the first ring point after the owner's hash."""
+        index = bisect.bisect(self.hashes, _hash(str(owner_id))) % len(self.hashes)
+        return self.names[index]
+
+
+def create_sharded_sessionmaker(
+    primary_engine: Engine, shard_engines: dict[str, Engine]
+) -> sessionmaker[Session]:
+    """Create sessions routing todos to the shards, and the rest to the primary."""
+    ring = ShardRing(shard_engines)
+    todo_mapper = db_models.Todo.__mapper__
+
+    def shard_chooser(mapper: Mapper[Any] | None, instance: Any, clause: Any = None):
+        if mapper is not todo_mapper:
+            return PRIMARY_SHARD
+        if instance is None or instance.owner_id is None:
+            raise ValueError("Can't choose a todo shard without the todo's owner_id")
+        return ring.get_shard(instance.owner_id)
+
+    def identity_chooser(mapper: Mapper[Any], primary_key: Any, **_: Any):
+        if mapper is not todo_mapper:
+            return [PRIMARY_SHARD]
+        return list(shard_engines)
+
+    def execute_chooser(orm_context: ORMExecuteState):
+        if orm_context.bind_mapper is not todo_mapper:
+            return [PRIMARY_SHARD]
+        owner_ids = _get_owner_ids(orm_context.statement)
+        if owner_ids is None:
+            return list(shard_engines)
+        return sorted({ring.get_shard(owner_id) for owner_id in owner_ids})
+
+    return sessionmaker(
+        class_=TodoShardedSession,
+        shards={PRIMARY_SHARD: primary_engine, **shard_engines},
+        shard_chooser=shard_chooser,
+        identity_chooser=identity_chooser,
+        execute_chooser=execute_chooser,
+        expire_on_commit=False,
+        info={TODO_SHARDS: list(shard_engines)},
+    )
+
+
+def get_todo_shards(db: Session) -> list[str] | None:
+    """Get the todo shard names, or None if the session isn't sharded."""
+    return db.info.get(TODO_SHARDS)
+
+
+def create_shard_tables(shard_engines: dict[str, Engine]) -> None:
+    """Create the todos table on each shard.
+
+    Users stay on the primary, so the owner_id foreign key is left out.
+    """
+    metadata = MetaData()
+    todos = Table(
+        db_models.Todo.__tablename__,
+        metadata,
+        *(
+            Column(
+                column.name,
+                column.type,
+                primary_key=column.primary_key,
+                nullable=column.nullable,
+                autoincrement=False,
+            )
+            for column in db_models.Todo.__table__.columns
+        ),
+    )
+    Index("ix_todos_owner_id_id", todos.c.owner_id, todos.c.id)
+    Index("ix_todos_deleted_at", todos.c.deleted_at)
+    for shard_engine in shard_engines.values():
+        metadata.create_all(bind=shard_engine)
+
+
+# ------------ Helpers ------------
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+def _get_owner_ids(statement: Any) -> list[int] | None:
+    """Get the owner ids a statement filters on, or None if it doesn't.
+
+    Only comparisons ANDed with the rest of the WHERE clause narrow it down:
+    under an OR, other rows match too, wherever they are.
+    """
+    whereclause = getattr(statement, "whereclause", None)
+    if whereclause is None:
+        return None
+    owner_ids: list[int] | None = None
+    for conjunct in _get_conjuncts(whereclause):
+        if (compared_ids := _get_compared_owner_ids(conjunct)) is not None:
+            owner_ids = [*(owner_ids or []), *compared_ids]
+    return owner_ids
+
+
+def _get_conjuncts(clause: Any) -> list[Any]:
+    """Split a clause into the clauses ANDed at its top level."""
+    if isinstance(clause, Grouping):
+        return _get_conjuncts(clause.element)
+    if isinstance(clause, BooleanClauseList) and clause.operator is operators.and_:
+        return [
+            conjunct for child in clause.clauses for conjunct in _get_conjuncts(child)
+        ]
+    return [clause]
+
+
+def _get_compared_owner_ids(clause: Any) -> list[int] | None:
+    """Get the owner ids of an `owner_id ==` or `owner_id IN` comparison."""
+    if not isinstance(clause, BinaryExpression):
+        return None
+    owner_id_column = db_models.Todo.__table__.c.owner_id
+    for column, bind in ((clause.left, clause.right), (clause.right, clause.left)):
+        if not isinstance(bind, BindParameter) or not isinstance(column, ColumnElement):
+            continue
+        if not column.shares_lineage(owner_id_column):
+            continue
+        if clause.operator == operators.eq:
+            return [bind.effective_value]
+        if clause.operator == operators.in_op:
+            return list(bind.effective_value)
+    return None
+
+
+@event.listens_for(TodoShardedSession, "before_flush")
+def _allocate_todo_ids(session: Session, *_: Any) -> None:
+    """Give new todos ids from the primary before they are flushed."""
+    new_todos = [
+        todo
+        for todo in session.new
+        if isinstance(todo, db_models.Todo) and todo.id is None
+    ]
+    if not new_todos:
+        return
+    connection = session.connection(bind_arguments={"shard_id": PRIMARY_SHARD})
+    for todo in new_todos:
+        result = connection.execute(insert(db_models.TodoId.__table__))
+        todo.id = result.inserted_primary_key[0]
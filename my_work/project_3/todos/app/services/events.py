@@ -0,0 +1,107 @@
+"""Publish/subscribe for todo change events.
+
+Mutations publish a `TodoEvent` to the owner's channel, and every open
+stream for that user (see `GET /todos/events`) receives it.
+`InMemoryBroker` only reaches subscribers in the same process; a multi-node
+deployment should provide another `Broker`, e.g. backed by Redis pub/sub
+or Postgres LISTEN/NOTIFY, and assign it to `broker`.
+"""
+import asyncio
+import contextlib
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from enum import Enum
+from typing import Any
+
+from pydantic import BaseModel
+
+from app.datastore import db_models
+
+# Events beyond this are dropped for a slow subscriber, which resyncs on reload
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class TodoEventType(str, Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+
+
+class TodoEvent(BaseModel):
+    type: TodoEventType
+    todo: dict[str, Any]
+
+    @classmethod
+    def from_todo(cls, type: TodoEventType, todo: db_models.Todo) -> "TodoEvent":
+        return cls(
+            type=type,
+            todo={
+                "id": todo.id,
+                "title": todo.title,
+                "description": todo.description,
+                "priority": todo.priority,
+                "completed": todo.completed,
+                "owner_id": todo.owner_id,
+            },
+        )
+
+
+class Broker(ABC):
+    """Interface for delivering events to subscribers of a channel."""
+
+    @abstractmethod
+    async def publish(self, channel: str, event: TodoEvent) -> None:
+        """Publish an event to every subscriber of the channel."""
+
+    @abstractmethod
+    def subscribe(
+        self, channel: str, timeout: float | None = None
+    ) -> AsyncIterator[TodoEvent | None]:
+        """Yield events published to the channel until the caller stops.
+
+        Yield None whenever `timeout` seconds pass without an event, so the
+        caller can keep an idle connection alive.
+        """
+
+
+class InMemoryBroker(Broker):
+    """Broker for a single process."""
+
+    def __init__(self) -> None:
+        self.subscribers: dict[str, set[asyncio.Queue[TodoEvent]]] = defaultdict(set)
+
+    async def publish(self, channel: str, event: TodoEvent) -> None:
+        for queue in self.subscribers.get(channel, ()):
+            with contextlib.suppress(asyncio.QueueFull):
+                queue.put_nowait(event)
+
+    async def subscribe(
+        self, channel: str, timeout: float | None = None
+    ) -> AsyncIterator[TodoEvent | None]:
+        queue: asyncio.Queue[TodoEvent] = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self.subscribers[channel].add(queue)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self.subscribers[channel].discard(queue)
+            if not self.subscribers[channel]:
+                del self.subscribers[channel]
+
+
+broker: Broker = InMemoryBroker()
+
+
+def user_channel(user_id: int) -> str:
+    return f"todos:{user_id}"
+
+
+async def publish_todo_event(type: TodoEventType, todo: db_models.Todo) -> None:
+    """Publish a todo event to the todo owner's channel."""
+    await broker.publish(
+        user_channel(todo.owner_id), TodoEvent.from_todo(type=type, todo=todo)
+    )
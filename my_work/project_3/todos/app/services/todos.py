@@ -1,8 +1,23 @@
-from typing import cast
+import heapq
+import itertools
+from typing import NamedTuple, cast
 
+from sqlalchemy import func
+from sqlalchemy.ext.horizontal_shard import set_shard_id
 from sqlalchemy.orm import Session
 
-from app.datastore import db_models
+from app.datastore import db_models, group_commit, sharding
+from app.services import events
+from app.web import errors
+
+
+class TodoCounts(NamedTuple):
+    total: int
+    completed: int
+
+    @property
+    def remaining(self) -> int:
+        return self.total - self.completed
 
 
 async def get_todos_list(db: Session, current_user: db_models.User):
@@ -10,14 +25,67 @@ async def get_todos_list(db: Session, current_user: db_models.User):
     return cast(list[db_models.Todo], query.all())
 
 
-async def add_todo(db: Session, current_user: db_models.User, title: str):
-    todo = db_models.Todo(
+def get_todos_page(
+    db: Session, after_id: int, limit: int, owner_id: int | None = None
+) -> list[db_models.Todo]:
+    """Get up to `limit` todos with ids after `after_id`, ordered by id.
+
+    Keyset pagination stays fast on deep pages. Unless filtered on a single
+    owner, a sharded session queries each shard for its first `limit` todos
+    and merges them.
+    """
+    query = db.query(db_models.Todo).filter(db_models.Todo.id > after_id)
+    if owner_id is not None:
+        query = query.filter(db_models.Todo.owner_id == owner_id)
+    query = query.order_by(db_models.Todo.id).limit(limit)
+    shards = sharding.get_todo_shards(db)
+    if not shards or owner_id is not None:
+        return cast(list[db_models.Todo], query.all())
+    shard_pages = [query.options(set_shard_id(shard)).all() for shard in shards]
+    merged = heapq.merge(*shard_pages, key=lambda todo: todo.id)
+    return list(itertools.islice(merged, limit))
+
+
+def new_todo(current_user: db_models.User, title: str) -> db_models.Todo:
+    """Create a todo with the html app's defaults, not yet added to a session."""
+    return db_models.Todo(
         title=title,
         description="Doesn't matter...",
         priority=1,
         owner_id=current_user.id,
         completed=False,
     )
-    db.add(todo)
-    db.commit()
+
+
+async def add_todo(db: Session, current_user: db_models.User, title: str):
+    def add(session: Session) -> db_models.Todo:
+        todo = new_todo(current_user, title)
+        session.add(todo)
+        return todo
+
+    todo = db.merge(await group_commit.run_write(db, add), load=False)
+    await events.publish_todo_event(events.TodoEventType.CREATED, todo)
     return todo
+
+
+def get_todo_for_write(session: Session, todo_id: int) -> db_models.Todo:
+    """Get a todo in a write's session, which may not be the request's.
+
+    Ownership is checked on the request's session, before the write.
+    """
+    if todo := session.get(db_models.Todo, todo_id):
+        return todo
+    raise errors.TodoNotFoundError
+
+
+async def get_todo_counts(db: Session, current_user: db_models.User) -> TodoCounts:
+    """Count the user's todos in a single aggregate query."""
+    total, completed = (
+        db.query(
+            func.count(db_models.Todo.id),
+            func.count(db_models.Todo.id).filter(db_models.Todo.completed),
+        )
+        .filter(db_models.Todo.owner_id == current_user.id)
+        .one()
+    )
+    return TodoCounts(total=total, completed=completed)
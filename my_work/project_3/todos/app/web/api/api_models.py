@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from pydantic import BaseModel, EmailStr, Field
 
 from app.web import field_types as ft
@@ -56,6 +58,24 @@ class TodoOutLimited(BaseModel):
     completed: bool
 
 
+# ----------- API Key Models -----------
+class ApiKeyInPost(BaseModel):
+    name: ft.Min3Field
+
+
+class ApiKeyOut(BaseModel):
+    id: int
+    name: str
+    prefix: str
+    created_at: datetime
+
+
+class ApiKeyOutCreated(ApiKeyOut):
+    """Includes the key itself, which is only shown once"""
+
+    key: str
+
+
 # ----------- Full Models -----------
 class TodoOutFull(TodoOutLimited):
     owner: UserOutLimited
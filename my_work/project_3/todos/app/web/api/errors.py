@@ -16,3 +16,6 @@ UserPermissionsError = HTTPException(
 
 # ----------- Todo Errors -----------
 TodoNotFoundError = HTTPException(status_code=404, detail="Todo not found")
+
+# ----------- API Key Errors -----------
+ApiKeyNotFoundError = HTTPException(status_code=404, detail="API key not found")
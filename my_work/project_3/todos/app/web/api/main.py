@@ -1,8 +1,11 @@
 from fastapi import FastAPI
 
-from app.web.api.routes import auth, todos, users
+from app.web.api.error_handlers import register_error_handlers
+from app.web.api.routes import api_keys, auth, todos, users
 
 app = FastAPI()
 
-for route in (auth, users, todos):
+for route in (auth, users, todos, api_keys):
     app.include_router(route.router)
+
+register_error_handlers(app)
@@ -0,0 +1,76 @@
+from typing import cast
+
+from fastapi import APIRouter, status
+
+from app.datastore import db_models
+from app.datastore.database import DBDependency
+from app.web import api_keys, auth
+from app.web import field_types as ft
+from app.web.api import api_models, errors
+
+# ----------- Routers -----------
+router = APIRouter(tags=["api keys"], prefix="/api-keys")
+
+
+# ----------- API key routes -----------
+@router.get(
+    "", response_model=list[api_models.ApiKeyOut], status_code=status.HTTP_200_OK
+)
+async def get_api_keys(
+    current_user: auth.TokenRequiredUser, db: DBDependency
+) -> list[db_models.ApiKey]:
+    """Get the current user's active API keys."""
+    query = db.query(db_models.ApiKey).filter(
+        db_models.ApiKey.user_id == current_user.id,
+        db_models.ApiKey.revoked.is_(False),
+    )
+    return cast(list[db_models.ApiKey], query.all())
+
+
+@router.post(
+    "",
+    response_model=api_models.ApiKeyOutCreated,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_api_key(
+    current_user: auth.TokenRequiredUser,
+    api_key_in: api_models.ApiKeyInPost,
+    db: DBDependency,
+) -> api_models.ApiKeyOutCreated:
+    """Create an API key, send it in the X-API-Key header.
+
+    The key is only returned here, store it safely.
+    """
+    api_key_model, api_key = api_keys.create_api_key(
+        db, user_id=current_user.id, name=api_key_in.name
+    )
+    db.flush()
+    api_key_out = api_models.ApiKeyOutCreated(
+        id=api_key_model.id,
+        name=api_key_model.name,
+        prefix=api_key_model.prefix,
+        created_at=api_key_model.created_at,
+        key=api_key,
+    )
+    db.commit()
+    return api_key_out
+
+
+@router.delete("/{api_key_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete(
+    current_user: auth.TokenRequiredUser, api_key_id: ft.Id, db: DBDependency
+) -> None:
+    """Revoke an API key."""
+    api_key_model = (
+        db.query(db_models.ApiKey)
+        .filter(
+            db_models.ApiKey.id == api_key_id,
+            db_models.ApiKey.user_id == current_user.id,
+            db_models.ApiKey.revoked.is_(False),
+        )
+        .first()
+    )
+    if not api_key_model:
+        raise errors.ApiKeyNotFoundError
+    api_keys.revoke_api_key(api_key_model)
+    db.commit()
@@ -1,21 +1,45 @@
 from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
-from fastapi import APIRouter, Cookie, Response
+from fastapi import APIRouter, Cookie, Request, Response
 
 from app.datastore.database import DBDependency
-from app.web import auth, errors, web_models
+from app.web import auth, errors, rate_limit, signing_keys, web_models
 from app.web import field_types as ft
 
 # ----------- Routers -----------
 router = APIRouter(tags=["auth"], prefix="/auth")
 
+# Verifiers should also refetch when they see an unknown kid
+JWKS_MAX_AGE = 60
+
 
 @router.post("/token")
 async def login_for_access_token(
+    request: Request,
     db: DBDependency,
     username: ft.StrFormField,
     password: ft.StrFormField,
 ):
-    user = auth.authenticate_user(username=username, password=password, db=db)
-    return auth.create_access_token(user=user)
+    client_ip = request.client.host if request.client else None
+    async with rate_limit.login_attempt(client_ip=client_ip, username=username):
+        user = await auth.authenticate_user(username=username, password=password, db=db)
+    token = auth.create_tokens(user=user, db=db)
+    # Commit before responding, so the refresh token is usable right away
+    db.commit()
+    return token
+
+
+@router.post("/refresh")
+async def refresh_access_token(db: DBDependency, refresh_token: ft.StrFormField):
+    """Exchange a refresh token for a new access token and refresh token."""
+    token = await auth.refresh_access_token(refresh_token=refresh_token, db=db)
+    db.commit()
+    return token
+
+
+@router.get("/jwks.json")
+async def get_jwks(response: Response) -> dict[str, list[dict[str, str]]]:
+    """Get the public keys that verify access tokens."""
+    response.headers["Cache-Control"] = f"public, max-age={JWKS_MAX_AGE}"
+    return signing_keys.key_set.jwks()
@@ -3,8 +3,10 @@ from typing import cast
 from fastapi import APIRouter, status
 
 from app.datastore import db_models as db_models
+from app.datastore import group_commit
 from app.datastore.database import DBDependency, Session
-from app.web import auth
+from app.services import events, todos
+from app.web import auth, web_models
 from app.web import field_types as ft
 from app.web.api import api_models, errors
 
@@ -16,9 +18,23 @@ router = APIRouter(tags=["todos"], prefix="/todos")
     "", response_model=list[api_models.TodoOutLimited], status_code=status.HTTP_200_OK
 )
 async def get_todos(
-    current_user: auth.TokenRequiredUser, db: DBDependency
+    current_user: auth.ApiKeyOrTokenUser,
+    db: DBDependency,
+    after_id: ft.AfterIdQuery = None,
+    limit: ft.LimitQuery = None,
 ) -> list[db_models.Todo]:
-    """Get todos, filtering on the desired fields."""
+    """Get todos, filtering on the desired fields.
+
+    Pass `limit` to page through the todos by id, with `after_id` set to the
+    last id of the previous page.
+    """
+    if limit is not None:
+        return todos.get_todos_page(
+            db,
+            after_id=after_id or 0,
+            limit=limit,
+            owner_id=None if current_user.is_admin() else current_user.id,
+        )
     query = db.query(db_models.Todo)
     if not current_user.is_admin():
         query = query.filter(db_models.Todo.owner_id == current_user.id)
@@ -29,7 +45,7 @@ async def get_todos(
     "/{todo_id}", status_code=status.HTTP_200_OK, response_model=api_models.TodoOutFull
 )
 async def get_todo(
-    current_user: auth.TokenRequiredUser, todo_id: ft.Id, db: DBDependency
+    current_user: auth.ApiKeyOrTokenUser, todo_id: ft.Id, db: DBDependency
 ) -> db_models.Todo:
     """Get a todo by id."""
     return _get_todo_by_id(current_user=current_user, todo_id=todo_id, db=db)
@@ -39,21 +55,25 @@ async def get_todo(
     "", status_code=status.HTTP_201_CREATED, response_model=api_models.TodoOutFull
 )
 async def create_todo(
-    current_user: auth.TokenRequiredUser,
+    current_user: auth.ApiKeyOrTokenUser,
     todo_in: api_models.TodoInPost,
     db: DBDependency,
 ) -> db_models.Todo:
     """Create a todo."""
-    todo_model = db_models.Todo(
-        title=todo_in.title,
-        description=todo_in.description,
-        priority=todo_in.priority,
-        completed=todo_in.completed,
-        owner_id=current_user.id,
-    )
-    db.add(todo_model)
-    db.commit()
-    db.refresh(todo_model)
+
+    def create(session: Session) -> db_models.Todo:
+        todo_model = db_models.Todo(
+            title=todo_in.title,
+            description=todo_in.description,
+            priority=todo_in.priority,
+            completed=todo_in.completed,
+            owner_id=current_user.id,
+        )
+        session.add(todo_model)
+        return todo_model
+
+    todo_model = db.merge(await group_commit.run_write(db, create), load=False)
+    await events.publish_todo_event(events.TodoEventType.CREATED, todo_model)
     return todo_model
 
 
@@ -61,33 +81,40 @@ async def create_todo(
     "/{todo_id}", status_code=status.HTTP_200_OK, response_model=api_models.TodoOutFull
 )
 async def update_todo(
-    current_user: auth.TokenRequiredUser,
+    current_user: auth.ApiKeyOrTokenUser,
     todo_id: ft.Id,
     todo_in: api_models.TodoInPatch,
     db: DBDependency,
 ) -> db_models.Todo:
     """Update a todo."""
-    todo_model = _get_todo_by_id(current_user=current_user, todo_id=todo_id, db=db)
-    for field, value in todo_in.model_dump(exclude_unset=True).items():
-        setattr(todo_model, field, value)
-    db.commit()
-    db.refresh(todo_model)
+    _get_todo_by_id(current_user=current_user, todo_id=todo_id, db=db)
+
+    def update(session: Session) -> db_models.Todo:
+        todo_model = todos.get_todo_for_write(session=session, todo_id=todo_id)
+        for field, value in todo_in.model_dump(exclude_unset=True).items():
+            setattr(todo_model, field, value)
+        return todo_model
+
+    todo_model = db.merge(await group_commit.run_write(db, update), load=False)
+    await events.publish_todo_event(events.TodoEventType.UPDATED, todo_model)
     return todo_model
 
 
 @router.delete("/{todo_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete(
-    current_user: auth.TokenRequiredUser, todo_id: ft.Id, db: DBDependency
+    current_user: auth.ApiKeyOrTokenUser, todo_id: ft.Id, db: DBDependency
 ) -> None:
     """Delete a todo."""
     todo_model = _get_todo_by_id(current_user=current_user, todo_id=todo_id, db=db)
-    db.delete(todo_model)
-    db.commit()
+    await group_commit.run_write(
+        db, lambda session: todos.get_todo_for_write(session, todo_id).soft_delete()
+    )
+    await events.publish_todo_event(events.TodoEventType.DELETED, todo_model)
 
 
 # ------------ Helpers ------------
 def _get_todo_by_id(
-    current_user: db_models.User, todo_id: ft.Id, db: Session
+    current_user: db_models.User | web_models.TokenUser, todo_id: ft.Id, db: Session
 ) -> db_models.Todo:
     """Get a todo by id."""
     query = db.query(db_models.Todo).filter(db_models.Todo.id == todo_id)
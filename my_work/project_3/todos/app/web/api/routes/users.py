@@ -12,6 +12,8 @@ from app.web.web_models import UnauthenticatedUser
 
 # ----------- Routers -----------
 router = APIRouter(tags=["users"], prefix="/users")
+# Changing these invalidates the claims of tokens already issued to the user
+TOKEN_REVOKING_FIELDS = {"username", "password", "role", "is_active"}
 
 
 # ----------- User routes -----------
@@ -83,11 +85,14 @@ async def update_current_user(
     db: DBDependency,
 ) -> db_models.User:
     """Update the current user."""
-    for field, value in user_in.model_dump(exclude_unset=True).items():
+    user_updates = user_in.model_dump(exclude_unset=True)
+    for field, value in user_updates.items():
         if field == "password":
             field = "hashed_password"
             value = auth.hash_password(value)
         setattr(current_user, field, value)
+    if TOKEN_REVOKING_FIELDS.intersection(user_updates):
+        await auth.revoke_user_tokens(current_user.id, db)
     db.commit()
     db.refresh(current_user)
     return current_user
@@ -104,11 +109,14 @@ async def update_user(
 ) -> db_models.User:
     """Update a user."""
     user_model = _get_user_by_id(current_user=current_user, user_id=user_id, db=db)
-    for field, value in user_in.model_dump(exclude_unset=True).items():
+    user_updates = user_in.model_dump(exclude_unset=True)
+    for field, value in user_updates.items():
         if field == "password":
             field = "hashed_password"
             value = auth.hash_password(value)
         setattr(user_model, field, value)
+    if TOKEN_REVOKING_FIELDS.intersection(user_updates):
+        await auth.revoke_user_tokens(user_model.id, db)
     db.commit()
     db.refresh(user_model)
     return user_model
@@ -118,11 +126,15 @@ async def update_user(
 async def delete_current_user(
     current_user: auth.TokenRequiredUser, db: DBDependency
 ) -> None:
-    """Delete a user."""
+    """Delete a user.
+
+    The user's todos are purged later, in the background.
+    """
     user_model = _get_user_by_id(
         current_user=current_user, user_id=current_user.id, db=db
     )
-    db.delete(user_model)
+    await auth.revoke_user_tokens(user_model.id, db)
+    user_model.soft_delete()
     db.commit()
 
 
@@ -130,9 +142,13 @@ async def delete_current_user(
 async def delete(
     current_user: auth.TokenRequiredUser, user_id: ft.Id, db: DBDependency
 ) -> None:
-    """Delete a user."""
+    """Delete a user.
+
+    The user's todos are purged later, in the background.
+    """
     user_model = _get_user_by_id(current_user=current_user, user_id=user_id, db=db)
-    db.delete(user_model)
+    await auth.revoke_user_tokens(user_model.id, db)
+    user_model.soft_delete()
     db.commit()
 
 
@@ -0,0 +1,106 @@
+"""API keys for machine clients.
+
+Keys look like `todo_<prefix>_<secret>`. The prefix finds the key's row by
+a unique index, and the SHA-256 digest of the whole key is compared. The
+secret is random rather than a password, so no slow hash is needed.
+
+Verified keys are cached by digest for `CACHE_TTL` seconds, so most
+requests authenticate without a database query. Other processes may keep
+accepting a revoked key until their cache entry expires.
+"""
+import hashlib
+import hmac
+import secrets
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy.orm import Session
+
+from app.datastore import db_models
+from app.web import errors, web_models
+
+KEY_NAMESPACE = "todo"
+PREFIX_BYTES = 6
+SECRET_BYTES = 32
+CACHE_TTL = 60
+CACHE_SIZE = 10_000
+
+# key digest -> (principal, expires at)
+_cache: dict[str, tuple[web_models.TokenUser, float]] = {}
+
+
+def create_api_key(
+    db: Session, user_id: int, name: str
+) -> tuple[db_models.ApiKey, str]:
+    """Add an API key for the user, committed with the session.
+
+    Return the model and the key, which is not stored and can't be shown again.
+    """
+    prefix = secrets.token_hex(PREFIX_BYTES)
+    api_key = f"{KEY_NAMESPACE}_{prefix}_{secrets.token_urlsafe(SECRET_BYTES)}"
+    api_key_model = db_models.ApiKey(
+        name=name,
+        prefix=prefix,
+        key_hash=_hash_key(api_key),
+        user_id=user_id,
+        created_at=datetime.now(timezone.utc).replace(tzinfo=None),
+    )
+    db.add(api_key_model)
+    return api_key_model, api_key
+
+
+def authenticate_api_key(db: Session, api_key: str) -> web_models.TokenUser:
+    """Get the principal of an API key."""
+    key_hash = _hash_key(api_key)
+    principal, expires_at = _cache.get(key_hash, (None, 0.0))
+    if principal and expires_at > time.monotonic():
+        return principal
+
+    namespace, _, rest = api_key.partition("_")
+    prefix, _, _ = rest.partition("_")
+    if namespace != KEY_NAMESPACE or not prefix:
+        raise errors.UserNotValidatedError
+    api_key_model = (
+        db.query(db_models.ApiKey).filter(db_models.ApiKey.prefix == prefix).first()
+    )
+    if (
+        not api_key_model
+        or api_key_model.revoked
+        or not hmac.compare_digest(api_key_model.key_hash, key_hash)
+    ):
+        raise errors.UserNotValidatedError
+    if not (user := api_key_model.user):
+        # The user was deleted, and its keys not purged yet
+        raise errors.UserNotValidatedError
+    principal = web_models.TokenUser(id=user.id, username=user.username, role=user.role)
+    _cache_principal(key_hash, principal)
+    return principal
+
+
+def revoke_api_key(api_key_model: db_models.ApiKey) -> None:
+    """Revoke the API key, committed with the session."""
+    api_key_model.revoked = True
+    _cache.pop(api_key_model.key_hash, None)
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drop the user's cached principals, e.g. after their role changes."""
+    for key_hash, (principal, _) in list(_cache.items()):
+        if principal.id == user_id:
+            del _cache[key_hash]
+
+
+# ------------ Helpers ------------
+def _hash_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def _cache_principal(key_hash: str, principal: web_models.TokenUser) -> None:
+    now = time.monotonic()
+    if len(_cache) >= CACHE_SIZE:
+        for cached_hash, (_, expires_at) in list(_cache.items()):
+            if expires_at <= now:
+                del _cache[cached_hash]
+        if len(_cache) >= CACHE_SIZE:
+            _cache.clear()
+    _cache[key_hash] = (principal, now + CACHE_TTL)
@@ -1,31 +1,95 @@
+import asyncio
+import functools
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated, Any
 
 from fastapi import Cookie, Depends
-from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
 
 from app.datastore import db_models
-from app.datastore.database import DBDependency
-from app.web import errors, web_models
+from app.datastore.database import DBDependency, Session
+from app.web import (
+    api_keys,
+    errors,
+    jwt_backends,
+    rate_limit,
+    refresh_tokens,
+    revocation,
+    signing_keys,
+    web_models,
+)
 from app.web import field_types as ft
 
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+# ----------- Password Hashing Constants -----------
+# The first scheme hashes new passwords, the others are rehashed on login.
+# Set to "argon2,bcrypt" to move to argon2 (requires argon2-cffi).
+PASSWORD_SCHEMES = os.environ.get("PASSWORD_SCHEMES", "bcrypt").split(",")
+# Tune per host with `python -m scripts.calibrate_password_hash`
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+ARGON2_TIME_COST = int(os.environ.get("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.environ.get("ARGON2_MEMORY_COST", "65536"))  # KiB
+ARGON2_PARALLELISM = int(os.environ.get("ARGON2_PARALLELISM", "4"))
+
+
+def create_password_context(
+    schemes: list[str] = PASSWORD_SCHEMES,
+    bcrypt_rounds: int = BCRYPT_ROUNDS,
+    argon2_time_cost: int = ARGON2_TIME_COST,
+    argon2_memory_cost: int = ARGON2_MEMORY_COST,
+    argon2_parallelism: int = ARGON2_PARALLELISM,
+) -> "CryptContext":
+    """Create the password context.
+
+    Hashes made with another scheme or cost need an update, so a cost
+    change in either direction is applied to each user on their next login.
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=schemes,
+        deprecated="auto",
+        bcrypt__default_rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        bcrypt__max_rounds=bcrypt_rounds,
+        argon2__time_cost=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+
+@functools.cache
+def get_password_context() -> "CryptContext":
+    """Get the password context, importing passlib on first use."""
+    return create_password_context()
+
+
 # ----------- Constants -----------
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="auth/token")
 optional_oauth2_bearer = OAuth2PasswordBearer(tokenUrl="auth", auto_error=False)
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+# Dedicated so slow hashes can't starve the threadpool used by other requests
+password_hash_executor = ThreadPoolExecutor(
+    max_workers=rate_limit.MAX_CONCURRENT_PASSWORD_VERIFICATIONS,
+    thread_name_prefix="password-hash",
+)
 
 
 # ----------- Imported Dependencies -----------
 TokenDependency = Annotated[str, Depends(oauth2_bearer)]
 OptionalTokenDependency = Annotated[str | None, Depends(optional_oauth2_bearer)]
 OptionalCookieDependency = Annotated[str | None, Cookie()]  # key matches param name
+OptionalApiKeyDependency = Annotated[str | None, Depends(api_key_header)]
 
 
-# ----------- User Constants (should be in secrets) -----------
-SECRET_KEY = "a32739cd7e677c1b8dfcf560a68d59793efdd035fa14dc488192b815d3b5e498"
-ALGORITHM = "HS256"
+# ----------- Token Constants -----------
+# Signing keys are in `signing_keys.KEYS_DIR`, which should be kept secret
 TOKEN_EXPIRATION = timedelta(minutes=15)
 
 
@@ -75,71 +139,210 @@ async def get_current_user_required_by_token(
     return get_current_user_by_id(user_id, db)
 
 
-async def refresh_token(
-    access_token: str, remaining_time: int | None = None
-) -> web_models.Token:
-    """Only refresh the token if it has less than time_remaining minutes left."""
+async def get_token_user_required_by_token(
+    access_token: TokenDependency,
+) -> web_models.TokenUser:
+    """Get the current user from the access_token claims alone.
+
+    No database lookup is made, so use it where only the user id, username
+    and role are needed.
+    """
+    if not access_token:
+        raise errors.UserNotAuthenticatedError
+
     payload = await parse_access_token(access_token=access_token)
+    if not payload.get("role"):
+        raise errors.UserNotValidatedError
+    return web_models.TokenUser(
+        id=payload["user_id"], username=payload["sub"], role=payload["role"]
+    )
 
-    if remaining_time is not None:
-        current_expires_at_float = float(payload["exp"])  # type: ignore[arg-type]
-        current_expires_at = datetime.fromtimestamp(
-            current_expires_at_float, tz=timezone.utc
-        )
-        if current_expires_at - datetime.now(timezone.utc) > timedelta(
-            minutes=remaining_time
-        ):
-            return encode_access_token(payload=payload)
 
-    new_expires_at = datetime.now(timezone.utc) + TOKEN_EXPIRATION
-    payload["exp"] = new_expires_at
-    return encode_access_token(payload=payload)
+async def get_token_user_required_by_api_key_or_token(
+    db: DBDependency,
+    api_key: OptionalApiKeyDependency,
+    access_token: OptionalTokenDependency,
+) -> web_models.TokenUser:
+    """Get the current user from the X-API-Key header or the access_token."""
+    if api_key:
+        return api_keys.authenticate_api_key(db, api_key)
+    if access_token:
+        return await get_token_user_required_by_token(access_token=access_token)
+    raise errors.UserNotAuthenticatedError
 
 
-async def parse_access_token(access_token: str) -> dict[str, str | int | datetime]:
-    """Parse the access token."""
+async def refresh_access_token(refresh_token: str, db: Session) -> web_models.Token:
+    """Rotate the refresh token and issue a new access token with it.
+
+    The user is reloaded, so the new access token has their current claims.
+    """
+    user, family_id, new_refresh_token = await refresh_tokens.rotate_refresh_token(
+        db, refresh_token=refresh_token, access_token_ttl=TOKEN_EXPIRATION
+    )
+    token = create_access_token(user=user, session_id=family_id)
+    token.refresh_token = new_refresh_token
+    return token
+
+
+async def parse_access_token(
+    access_token: str,
+) -> dict[str, str | int | float | datetime]:
+    """Parse the access token, rejecting revoked tokens."""
     try:
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-    except JWTError as e:
+        kid = jwt_backends.get_backend().get_kid(access_token)
+        if not (key := signing_keys.key_set.get(kid)):
+            raise errors.UserNotValidatedError
+        payload = jwt_backends.get_backend().decode(access_token, key)
+    except jwt_backends.InvalidTokenError as e:
         raise errors.UserNotValidatedError from e
     username: str = payload.get("sub", "")
     user_id: int = payload.get("user_id", 0)
     if not all((username, user_id)):
         raise errors.UserNotValidatedError
+    await check_access_token_claims(payload)
     return payload
 
 
-def create_access_token(user: db_models.User) -> web_models.Token:
-    expires_at = datetime.now(timezone.utc) + TOKEN_EXPIRATION
-    payload: dict[str, str | int | datetime] = {
+async def check_access_token_claims(payload: dict[str, Any]) -> None:
+    """Reject a parsed token that has since expired or been revoked.
+
+    Long-lived connections recheck their token with it, without decoding it
+    again.
+    """
+    if time.time() >= float(payload.get("exp", 0)):
+        raise errors.UserNotValidatedError
+    token_id = payload.get("jti")
+    if token_id and await revocation.store.is_token_revoked(token_id):
+        raise errors.UserNotValidatedError
+    user_id = int(payload["user_id"])
+    issued_at = float(payload.get("iat", 0))
+    if await revocation.store.is_user_revoked(user_id, issued_at):
+        raise errors.UserNotValidatedError
+
+
+def create_tokens(user: db_models.User, db: Session) -> web_models.Token:
+    """Start a session with an access token and a refresh token.
+
+    The refresh token is committed with the session.
+    """
+    family_id = refresh_tokens.new_family_id()
+    token = create_access_token(user=user, session_id=family_id)
+    token.refresh_token = refresh_tokens.issue_refresh_token(
+        db, user_id=user.id, family_id=family_id
+    )
+    return token
+
+
+def create_access_token(user: db_models.User, session_id: str) -> web_models.Token:
+    issued_at = datetime.now(timezone.utc)
+    payload: dict[str, str | int | float | datetime] = {
         "sub": user.username,
         "user_id": user.id,
         "role": user.role,
-        "exp": expires_at,
+        # Sub-second precision, so a login right after a revocation is valid
+        "iat": issued_at.timestamp(),
+        # Shared by every access token of the session, so revoking it ends it
+        "jti": session_id,
+        "exp": issued_at + TOKEN_EXPIRATION,
     }
     return encode_access_token(payload=payload)
 
 
-def encode_access_token(payload: dict[str, str | int | datetime]) -> web_models.Token:
-    access_token = jwt.encode(claims=payload, key=SECRET_KEY, algorithm=ALGORITHM)
+async def revoke_access_token(access_token: str) -> None:
+    """Revoke the access token's session, ignoring invalid tokens.
+
+    The `jti` is shared with the session's later access tokens, minted by a
+    refresh, so it is revoked until any token issued until now has expired,
+    not just this one.
+    """
+    try:
+        payload = await parse_access_token(access_token=access_token)
+    except errors.UserNotValidatedError:
+        return
+    if token_id := payload.get("jti"):
+        await revocation.store.revoke_token(
+            token_id,
+            expires_at=(datetime.now(timezone.utc) + TOKEN_EXPIRATION).timestamp(),
+        )
+
+
+def revoke_refresh_token(refresh_token: str, db: Session) -> None:
+    """Revoke the refresh token's session, committed with the session."""
+    if family_id := refresh_tokens.get_family_id(db, refresh_token):
+        refresh_tokens.revoke_family(db, family_id)
+
+
+async def revoke_user_tokens(user_id: int, db: Session) -> None:
+    """Revoke every token issued to the user so far.
+
+    The refresh tokens are revoked when the session is committed. API keys
+    stay valid, but their cached principals are dropped to pick up changes
+    to the user.
+    """
+    refresh_tokens.revoke_user_refresh_tokens(db, user_id)
+    api_keys.invalidate_user(user_id)
+    await revocation.store.revoke_user(user_id, ttl=TOKEN_EXPIRATION.total_seconds())
+
+
+def encode_access_token(
+    payload: dict[str, str | int | float | datetime]
+) -> web_models.Token:
+    access_token = jwt_backends.get_backend().encode(
+        claims=payload, key=signing_keys.key_set.current
+    )
     return web_models.Token(access_token=access_token, token_type="bearer")
 
 
-def authenticate_user(username: str, password: str, db: DBDependency) -> db_models.User:
+async def authenticate_user(
+    username: str, password: str, db: DBDependency
+) -> db_models.User:
+    """Authenticate a user by username and password.
+
+    Exactly one hash verification runs whether or not the user exists, so
+    failed logins take the same time and cost for known and unknown users.
+    Outdated hashes are replaced, committed along with the request session.
+    """
     user = db.query(db_models.User).filter(db_models.User.username == username).first()
-    if not user:
-        raise errors.UserNotAuthenticatedError
-    if not verify_password(password, user.hashed_password):
+    hashed_password = user.hashed_password if user else get_dummy_password_hash()
+    verified, new_hash = await verify_and_update_password_async(
+        password, hashed_password
+    )
+    if not user or not verified:
         raise errors.UserNotAuthenticatedError
+    if new_hash:
+        user.hashed_password = new_hash
     return user
 
 
 def hash_password(password: str) -> str:
-    return bcrypt_context.hash(password)
+    return get_password_context().hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt_context.verify(plain_password, hashed_password)
+    return get_password_context().verify(plain_password, hashed_password)
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    """Verify a password on the password hash pool, off the event loop.
+
+    Also return a new hash if the password was verified but its hash uses
+    an outdated scheme or cost.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_hash_executor,
+        get_password_context().verify_and_update,
+        plain_password,
+        hashed_password,
+    )
+
+
+@functools.cache
+def get_dummy_password_hash() -> str:
+    """Get a hash to verify against for unknown users, created once."""
+    return hash_password(secrets.token_urlsafe())
 
 
 def get_current_user_by_id(user_id: ft.Id, db: DBDependency) -> db_models.User:
@@ -161,6 +364,12 @@ TokenOptionalUser = Annotated[
     db_models.User | web_models.UnauthenticatedUser,
     Depends(get_current_user_optional_by_token),
 ]
+TokenClaimsUser = Annotated[
+    web_models.TokenUser, Depends(get_token_user_required_by_token)
+]
+ApiKeyOrTokenUser = Annotated[
+    web_models.TokenUser, Depends(get_token_user_required_by_api_key_or_token)
+]
 LoggedInUserOptional = Annotated[
     db_models.User | web_models.UnauthenticatedUser,
     Depends(get_current_user_optional_by_cookie),
@@ -1,3 +1,5 @@
+import math
+
 from fastapi import status
 
 
@@ -6,6 +8,7 @@ class WebError(Exception):
 
     detail = "Unknown error"
     status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    headers: dict[str, str] | None = None
 
     def __init__(self, detail: str | None = None):
         if detail:
@@ -52,3 +55,28 @@ class TodoNotFoundError(WebError):
 
     detail = "Todo not found"
     status_code = status.HTTP_404_NOT_FOUND
+
+
+class InvalidTodoMutationError(WebError):
+    """Todo mutation is missing or has invalid fields."""
+
+    detail = "Invalid todo mutation"
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+class TooManyRequestsError(WebError):
+    """Too many requests, try again after `retry_after` seconds."""
+
+    detail = "Too many requests, please try again later"
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+
+    def __init__(self, retry_after: float, detail: str | None = None):
+        super().__init__(detail)
+        self.headers = {"Retry-After": str(math.ceil(retry_after))}
+
+
+class RefreshTokenInUseError(WebError):
+    """Refresh token was rotated moments ago, by a concurrent request."""
+
+    detail = "Refresh token was just used, retry with its replacement"
+    status_code = status.HTTP_409_CONFLICT
@@ -1,6 +1,6 @@
 from typing import Annotated
 
-from fastapi import Form, Path
+from fastapi import Form, Path, Query
 from pydantic import Field
 
 Min3Field = Annotated[str, Field(min_length=3)]
@@ -8,6 +8,8 @@ Min3Max100Field = Annotated[str, Field(min_length=3, max_length=100)]
 PriorityField = Annotated[int, Field(ge=1, le=5)]
 Min8Field = Annotated[str, Field(min_length=8)]
 Id = Annotated[int, Path(ge=1)]
+AfterIdQuery = Annotated[int | None, Query(ge=0)]
+LimitQuery = Annotated[int | None, Query(ge=1, le=1000)]
 
 StrFormField = Annotated[str, Form()]
 PassFormField = Annotated[str, Form(..., min_length=8)]
@@ -0,0 +1,43 @@
+"""Helpers for htmx responses."""
+from collections.abc import Sequence
+from typing import Any, NamedTuple
+
+from fastapi import Request, status
+from fastapi.responses import HTMLResponse
+
+from app.web.html.const import templates
+
+
+class OobFragment(NamedTuple):
+    """A partial swapped out-of-band into the element sharing its id.
+
+    The partial is rendered with `oob=True` and should then add
+    `hx-swap-oob="true"` to its root element.
+    """
+
+    template_name: str
+    context: dict[str, Any]
+
+
+def oob_response(
+    request: Request,
+    template_name: str | None,
+    context: dict[str, Any],
+    oob_fragments: Sequence[OobFragment] = (),
+    status_code: int = status.HTTP_200_OK,
+) -> HTMLResponse:
+    """Render the main partial followed by its out-of-band fragments.
+
+    Pass `template_name=None` when the main target is only removed, such as
+    with `hx-swap="delete"`.
+    """
+    content = []
+    if template_name:
+        template = templates.get_template(template_name)
+        content.append(template.render({"request": request, **context}))
+    for fragment in oob_fragments:
+        template = templates.get_template(fragment.template_name)
+        content.append(
+            template.render({"request": request, "oob": True, **fragment.context})
+        )
+    return HTMLResponse(content="".join(content), status_code=status_code)
@@ -1,11 +1,11 @@
 from fastapi import FastAPI, Request, status
 from fastapi.responses import RedirectResponse
-from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
 
-from app.web.html import flash_messages
+from app.web.html import flash_messages, static_assets
 from app.web.html.const import STATIC_DIR, templates
 from app.web.html.error_handlers import register_error_handlers
+from app.web.html.middleware import SlidingSessionMiddleware
 from app.web.html.routes import auth, errors, todos, users
 
 SESSION_SECRET = "SUPER-SECRET-KEY"
@@ -13,6 +13,7 @@ SESSION_SECRET = "SUPER-SECRET-KEY"
 app = FastAPI()
 
 app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET)
+app.add_middleware(SlidingSessionMiddleware)
 
 routes = [auth, errors, todos, users]
 for route in routes:
@@ -20,8 +21,11 @@ for route in routes:
 
 register_error_handlers(app)
 
-app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+app.mount(
+    "/static", static_assets.CachedStaticFiles(directory=STATIC_DIR), name="static"
+)
 templates.env.globals["get_flashed_messages"] = flash_messages.get_flashed_messages
+templates.env.globals["static_url"] = static_assets.static_url
 
 
 @app.get("/")
@@ -0,0 +1,104 @@
+"""ASGI middleware for the html app."""
+from datetime import datetime, timedelta, timezone
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.datastore.database import session_scope
+from app.web import auth, errors, refresh_tokens, web_models
+from app.web.html.routes.auth import ACCESS_TOKEN, REFRESH_TOKEN
+
+# Refresh the access token once it has less than this many minutes left
+REFRESH_REMAINING_TIME = 5
+
+
+class SlidingSessionMiddleware:
+    """Refresh the access token on requests made near or after its expiry.
+
+    The refresh token cookie is rotated for a new access token, which the
+    request is then handled with. Most requests pay a single JWT decode, and
+    idle tabs make no requests at all.
+    """
+
+    def __init__(
+        self, app: ASGIApp, remaining_time: int = REFRESH_REMAINING_TIME
+    ) -> None:
+        self.app = app
+        self.remaining_time = remaining_time
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cookies = HTTPConnection(scope).cookies
+        refresh_token = cookies.get(REFRESH_TOKEN)
+        if not refresh_token or not await self._needs_refresh(
+            cookies.get(ACCESS_TOKEN)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            with session_scope() as db:
+                token = await auth.refresh_access_token(
+                    refresh_token=refresh_token, db=db
+                )
+        except (errors.UserNotValidatedError, errors.RefreshTokenInUseError):
+            # Leave it to the route to reject the token
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookies(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                cookies = headers.getlist("set-cookie")
+                # Don't override a login or logout in this response
+                if not any(cookie.startswith(f"{ACCESS_TOKEN}=") for cookie in cookies):
+                    for cookie in _token_cookies(token):
+                        headers.append("set-cookie", cookie)
+            await send(message)
+
+        scope = _with_cookie(scope, ACCESS_TOKEN, token.access_token)
+        await self.app(scope, receive, send_with_cookies)
+
+    async def _needs_refresh(self, access_token: str | None) -> bool:
+        if not access_token:
+            return True
+        try:
+            payload = await auth.parse_access_token(access_token=access_token)
+        except errors.UserNotValidatedError:
+            return True
+        expires_at = datetime.fromtimestamp(
+            float(payload["exp"]), tz=timezone.utc  # type: ignore[arg-type]
+        )
+        return expires_at - datetime.now(timezone.utc) < timedelta(
+            minutes=self.remaining_time
+        )
+
+
+def _token_cookies(token: web_models.Token) -> list[str]:
+    """Build the Set-Cookie header values for the access and refresh tokens."""
+    response = Response()
+    response.set_cookie(
+        key=ACCESS_TOKEN, value=token.access_token, httponly=True, secure=True
+    )
+    response.set_cookie(
+        key=REFRESH_TOKEN,
+        value=token.refresh_token or "",
+        max_age=int(refresh_tokens.REFRESH_TOKEN_EXPIRATION.total_seconds()),
+        httponly=True,
+        secure=True,
+    )
+    return response.headers.getlist("set-cookie")
+
+
+def _with_cookie(scope: Scope, key: str, value: str) -> Scope:
+    """Copy the scope with a request cookie replaced."""
+    cookies = {**HTTPConnection(scope).cookies, key: value}
+    cookie_header = "; ".join(f"{name}={value}" for name, value in cookies.items())
+    headers = [(name, value) for name, value in scope["headers"] if name != b"cookie"]
+    headers.append((b"cookie", cookie_header.encode("latin-1")))
+    return {**scope, "headers": headers}
@@ -1,7 +1,10 @@
-from typing import Annotated, cast
+import contextlib
+from collections.abc import AsyncIterator
+from typing import Annotated, Any, Literal, cast
 
-from fastapi import APIRouter, Path, Request, status
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, Path, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import HTMLResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 from wtforms import (
     BooleanField,
     Form,
@@ -9,34 +12,99 @@ from wtforms import (
     validators,
 )
 
-from app.datastore import db_models
-from app.datastore.database import DBDependency
-from app.services import todos
-from app.web import errors
+from app.datastore import db_models, group_commit
+from app.datastore.database import DBDependency, Session, session_scope
+from app.services import events, todos
+from app.web import auth, errors
 from app.web.api import api_models
-from app.web.auth import LoggedInUser
+from app.web.auth import LoggedInUser, OptionalCookieDependency
 from app.web.html.const import templates
+from app.web.html.flash_messages import FlashCategory, FlashMessage
+from app.web.html.htmx import OobFragment, oob_response
+from app.web.html.streaming import stream_template
 
 # ----------- Routers -----------
 router = APIRouter(tags=["todos"], prefix="/todos")
 
 TODO_PARTIAL_TEMPLATE = "todos/partials/todo.html"
+TODO_COUNT_PARTIAL_TEMPLATE = "todos/partials/todo_count.html"
+EMPTY_STATE_PARTIAL_TEMPLATE = "todos/partials/empty_state.html"
+FLASH_MESSAGES_PARTIAL_TEMPLATE = "shared/partials/flash_messages.html"
+EVENTS_KEEPALIVE_SECONDS = 15
+MAX_MUTATION_BATCH = 500
+TITLE_MIN_LENGTH = 3
+TITLE_MAX_LENGTH = 25
 
 
 @router.get("", response_class=HTMLResponse)
 async def get_todos(request: Request, db: DBDependency, current_user: LoggedInUser):
-    todos_list_db = await todos.get_todos_list(db, current_user)
+    return stream_template(
+        "todos/todos.html",
+        {
+            "request": request,
+            "current_user": current_user,
+            "todos": _iter_todos(db=db, current_user=current_user),
+        },
+    )
 
-    todos_list_api = [
-        api_models.TodoOutLimited(**todo.__dict__) for todo in todos_list_db
-    ]
 
-    return templates.TemplateResponse(
-        "todos/todos.html",
-        {"request": request, "current_user": current_user, "todos": todos_list_api},
+async def _iter_todos(
+    db: Session, current_user: db_models.User
+) -> AsyncIterator[api_models.TodoOutLimited]:
+    """Fetch the todos once the page head has been streamed."""
+    for todo in await todos.get_todos_list(db, current_user):
+        yield api_models.TodoOutLimited(**todo.__dict__)
+
+
+@router.get("/events")
+async def todo_events(
+    request: Request, access_token: OptionalCookieDependency = None
+) -> StreamingResponse:
+    """Stream the current user's todo changes as server-sent events.
+
+    The user is identified from the token claims alone, so an open stream
+    doesn't hold a database session. The stream ends once the token expires
+    or is revoked, e.g. on logout.
+    """
+    if not access_token:
+        raise errors.UserNotAuthenticatedError
+    payload = await auth.parse_access_token(access_token=access_token)
+    return StreamingResponse(
+        _stream_todo_events(request=request, payload=payload),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
     )
 
 
+async def _stream_todo_events(
+    request: Request, payload: dict[str, Any]
+) -> AsyncIterator[str]:
+    """Render each todo event into a server-sent event.
+
+    The token's claims are checked again at each event and keep-alive.
+    """
+    channel = events.user_channel(int(payload["user_id"]))
+    subscription = events.broker.subscribe(channel, timeout=EVENTS_KEEPALIVE_SECONDS)
+    async with contextlib.aclosing(subscription):
+        async for event in subscription:
+            try:
+                await auth.check_access_token_claims(payload)
+            except errors.UserNotValidatedError:
+                return
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            if event.type == events.TodoEventType.DELETED:
+                data = f"todo-{event.todo['id']}"
+            else:
+                template = templates.get_template(TODO_PARTIAL_TEMPLATE)
+                data = template.render({"request": request, "todo": event.todo})
+            data_lines = "".join(
+                f"data: {line}\n" for line in data.strip().splitlines()
+            )
+            yield f"event: {event.type.value}\n{data_lines}\n"
+
+
 class CreateTodoForm(Form):
     title: StringField = StringField(
         "Title", validators=[validators.Length(min=3, max=25)]
@@ -54,9 +122,12 @@ async def add_todo(request: Request, db: DBDependency, current_user: LoggedInUse
     )
     db.refresh(todo)
 
-    return templates.TemplateResponse(
-        TODO_PARTIAL_TEMPLATE,
-        {"request": request, "todo": todo},
+    counts = await todos.get_todo_counts(db, current_user)
+    oob_fragments = [_todo_count_fragment(counts)]
+    if counts.total == 1:
+        oob_fragments.append(_empty_state_fragment(show=False))
+    return oob_response(
+        request, TODO_PARTIAL_TEMPLATE, {"todo": todo}, oob_fragments=oob_fragments
     )
 
 
@@ -76,18 +147,23 @@ async def update_todo(
 ):
     form_data = await request.form()
     update_todo_form = UpdateTodoForm(**form_data)
-    todo = db.query(db_models.Todo).filter(db_models.Todo.id == todo_id).first()
-    if not todo:
-        raise errors.TodoNotFoundError
-    if todo.owner_id != current_user.id:
-        raise errors.TodoNotOwnedError
-    todo.title = update_todo_form.title.data
-    todo.completed = update_todo_form.completed.data
-    db.commit()
-    db.refresh(todo)
-    return templates.TemplateResponse(
-        TODO_PARTIAL_TEMPLATE,
-        {"request": request, "todo": todo},
+    todo = _get_owned_todo(db=db, todo_id=todo_id, current_user_id=current_user.id)
+    completed_changed = todo.completed != update_todo_form.completed.data
+
+    def update(session: Session) -> db_models.Todo:
+        todo = todos.get_todo_for_write(session=session, todo_id=todo_id)
+        todo.title = update_todo_form.title.data
+        todo.completed = update_todo_form.completed.data
+        return todo
+
+    todo = db.merge(await group_commit.run_write(db, update), load=False)
+    oob_fragments = []
+    if completed_changed:
+        counts = await todos.get_todo_counts(db, current_user)
+        oob_fragments.append(_todo_count_fragment(counts))
+    await events.publish_todo_event(events.TodoEventType.UPDATED, todo)
+    return oob_response(
+        request, TODO_PARTIAL_TEMPLATE, {"todo": todo}, oob_fragments=oob_fragments
     )
 
 
@@ -98,14 +174,183 @@ async def delete_todo(
     db: DBDependency,
     current_user: LoggedInUser,
 ):
+    todo = _get_owned_todo(db=db, todo_id=todo_id, current_user_id=current_user.id)
+    await group_commit.run_write(
+        db, lambda session: todos.get_todo_for_write(session, todo_id).soft_delete()
+    )
+    counts = await todos.get_todo_counts(db, current_user)
+    await events.publish_todo_event(events.TodoEventType.DELETED, todo)
+
+    oob_fragments = [
+        _todo_count_fragment(counts),
+        OobFragment(
+            FLASH_MESSAGES_PARTIAL_TEMPLATE,
+            {
+                "messages": [
+                    FlashMessage(
+                        msg=f"Deleted todo '{todo.title}'.",
+                        category=FlashCategory.SUCCESS,
+                        timeout=5,
+                    )
+                ]
+            },
+        ),
+    ]
+    if counts.total == 0:
+        oob_fragments.append(_empty_state_fragment(show=True))
+    # The todo itself is removed client side by `hx-swap="delete"`
+    return oob_response(request, None, {}, oob_fragments=oob_fragments)
+
+
+# ----------- Websocket -----------
+class TodoMutation(BaseModel):
+    """A todo change sent over the websocket.
+
+    `id` is chosen by the client to match the mutation to its ack.
+    """
+
+    id: str
+    op: Literal["create", "update", "delete"]
+    todo_id: int | None = None
+    title: str | None = None
+    completed: bool | None = None
+
+
+class TodoMutationBatch(BaseModel):
+    mutations: Annotated[list[TodoMutation], Field(max_length=MAX_MUTATION_BATCH)]
+
+
+class TodoMutationAck(BaseModel):
+    id: str
+    status_code: int = status.HTTP_200_OK
+    detail: str | None = None
+    html: str | None = None
+
+
+@router.websocket("/ws")
+async def todo_mutations_socket(
+    websocket: WebSocket, access_token: OptionalCookieDependency = None
+) -> None:
+    """Apply batches of todo mutations sent over a websocket.
+
+    The user is loaded once per connection, and the token is checked again
+    for each batch, so the socket closes once it expires or is revoked. Each
+    batch is applied with a single commit and answered with one ack per
+    mutation, plus the re-rendered todo counter. The batch's todo events are
+    published once it is committed.
+    """
+    try:
+        payload = await auth.parse_access_token(access_token=access_token or "")
+        with session_scope(use_replica=True) as db:
+            current_user = auth.get_current_user_by_id(
+                int(payload["user_id"]), db  # type: ignore[arg-type]
+            )
+    except (errors.UserNotValidatedError, errors.UserNotFoundError):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    while True:
+        try:
+            data = await websocket.receive_text()
+        except WebSocketDisconnect:
+            return
+        try:
+            await auth.parse_access_token(access_token=access_token or "")
+        except errors.UserNotValidatedError:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        try:
+            # Malformed JSON is a validation error too, answered like the rest
+            batch = TodoMutationBatch.model_validate_json(data)
+        except ValidationError as e:
+            await websocket.send_json({"detail": e.errors(include_url=False)})
+            continue
+        with session_scope() as db:
+            acks = await _apply_todo_mutations(
+                websocket=websocket, db=db, current_user=current_user, batch=batch
+            )
+            counts = await todos.get_todo_counts(db, current_user)
+        counter = templates.get_template(TODO_COUNT_PARTIAL_TEMPLATE).render(
+            {"request": websocket, "counts": counts}
+        )
+        await websocket.send_json(
+            {"acks": [ack.model_dump() for ack in acks], "fragments": [counter]}
+        )
+
+
+async def _apply_todo_mutations(
+    websocket: WebSocket,
+    db: Session,
+    current_user: db_models.User,
+    batch: TodoMutationBatch,
+) -> list[TodoMutationAck]:
+    """Apply the batch with the same ownership rules as the http routes."""
+    acks = []
+    changed: list[tuple[events.TodoEventType, db_models.Todo]] = []
+    for mutation in batch.mutations:
+        ack = TodoMutationAck(id=mutation.id)
+        try:
+            if mutation.title is not None and not (
+                TITLE_MIN_LENGTH <= len(mutation.title) <= TITLE_MAX_LENGTH
+            ):
+                raise errors.InvalidTodoMutationError(
+                    f"title must be {TITLE_MIN_LENGTH} to {TITLE_MAX_LENGTH} characters"
+                )
+            if mutation.op == "create":
+                if mutation.title is None:
+                    raise errors.InvalidTodoMutationError("title is required")
+                # Flushed for its id, and committed with the rest of the batch
+                todo = todos.new_todo(current_user, mutation.title)
+                db.add(todo)
+                db.flush()
+                changed.append((events.TodoEventType.CREATED, todo))
+            elif mutation.todo_id is None:
+                raise errors.InvalidTodoMutationError("todo_id is required")
+            else:
+                todo = _get_owned_todo(
+                    db=db, todo_id=mutation.todo_id, current_user_id=current_user.id
+                )
+        except errors.WebError as e:
+            ack.status_code = e.status_code
+            ack.detail = e.detail
+            acks.append(ack)
+            continue
+
+        if mutation.op == "delete":
+            todo.soft_delete()
+            changed.append((events.TodoEventType.DELETED, todo))
+        elif mutation.op == "update":
+            for field in ("title", "completed"):
+                if (value := getattr(mutation, field)) is not None:
+                    setattr(todo, field, value)
+            changed.append((events.TodoEventType.UPDATED, todo))
+        if mutation.op != "delete":
+            ack.html = templates.get_template(TODO_PARTIAL_TEMPLATE).render(
+                {"request": websocket, "todo": todo}
+            )
+        acks.append(ack)
+
+    db.commit()
+    for event_type, todo in changed:
+        await events.publish_todo_event(event_type, todo)
+    return acks
+
+
+# ------------ Helpers ------------
+def _todo_count_fragment(counts: todos.TodoCounts) -> OobFragment:
+    return OobFragment(TODO_COUNT_PARTIAL_TEMPLATE, {"counts": counts})
+
+
+def _empty_state_fragment(show: bool) -> OobFragment:
+    return OobFragment(EMPTY_STATE_PARTIAL_TEMPLATE, {"show": show})
+
+
+def _get_owned_todo(db: Session, todo_id: int, current_user_id: int) -> db_models.Todo:
+    """Get a todo, only if it belongs to the current user."""
     todo = db.query(db_models.Todo).filter(db_models.Todo.id == todo_id).first()
     if not todo:
         raise errors.TodoNotFoundError
-    if todo.owner_id != current_user.id:
+    if todo.owner_id != current_user_id:
         raise errors.TodoNotOwnedError
-    db.delete(todo)
-    db.commit()
-    return templates.TemplateResponse(
-        TODO_PARTIAL_TEMPLATE,
-        {"request": request, "todo": todo},
-    )
+    return todo
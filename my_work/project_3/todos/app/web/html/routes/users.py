@@ -67,6 +67,7 @@ async def login_post(
     response = RedirectResponse(url="/", status_code=status.HTTP_302_FOUND)
     try:
         await login_for_access_token(
+            request=request,
             response=response,
             db=db,
             username=login_form.username.data,
@@ -81,6 +82,17 @@ async def login_post(
                 "form": login_form,
             },
         )
+    except errors.TooManyRequestsError as e:
+        return templates.TemplateResponse(
+            LOGIN_TEMPLATE,
+            {
+                "request": request,
+                "message": FlashMessage(msg=e.detail, category=FlashCategory.ERROR),
+                "form": login_form,
+            },
+            status_code=e.status_code,
+            headers=e.headers,
+        )
 
     FlashMessage(
         msg="You are logged in!", category=FlashCategory.SUCCESS, timeout=5
@@ -179,11 +191,21 @@ async def register_post(
 
 
 @router.get("/logout", response_class=HTMLResponse)
-async def logout(request: Request):
+async def logout(
+    request: Request,
+    db: DBDependency,
+    access_token: auth.OptionalCookieDependency = None,
+    refresh_token: auth.OptionalCookieDependency = None,
+):
+    if access_token:
+        await auth.revoke_access_token(access_token)
+    if refresh_token:
+        auth.revoke_refresh_token(refresh_token, db)
     response = RedirectResponse(
         request.url_for("html:login_get"), status_code=status.HTTP_302_FOUND
     )
     response.delete_cookie(key="access_token", httponly=True)
+    response.delete_cookie(key="refresh_token", httponly=True)
     FlashMessage(
         msg="You are logged out!", category=FlashCategory.SUCCESS, timeout=5
     ).flash(request)
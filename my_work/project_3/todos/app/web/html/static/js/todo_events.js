@@ -0,0 +1,28 @@
+// Apply todo changes made in other tabs and devices, pushed by the server.
+(() => {
+  const list = document.getElementById("todo-list");
+  if (!list) return;
+
+  const source = new EventSource(list.dataset.eventsUrl);
+
+  const upsertTodo = (event) => {
+    const template = document.createElement("template");
+    template.innerHTML = event.data.trim();
+    const todo = template.content.firstElementChild;
+    const existing = document.getElementById(todo.id);
+    if (existing) {
+      existing.replaceWith(todo);
+    } else {
+      const emptyState = document.getElementById("todos-empty");
+      emptyState.classList.add("hidden");
+      emptyState.before(todo);
+    }
+    htmx.process(todo);
+  };
+
+  source.addEventListener("created", upsertTodo);
+  source.addEventListener("updated", upsertTodo);
+  source.addEventListener("deleted", (event) => {
+    document.getElementById(event.data)?.remove();
+  });
+})();
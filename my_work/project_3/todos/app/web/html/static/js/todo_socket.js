@@ -0,0 +1,68 @@
+// Send todo edits over one websocket in batches, instead of a request each.
+(() => {
+  const list = document.getElementById("todo-list");
+  if (!list || !("WebSocket" in window)) return;
+
+  const FLUSH_DELAY_MS = 50;
+
+  const socket = new WebSocket(list.dataset.socketUrl);
+
+  // Keyed by todo id, so repeated edits to a todo coalesce into one mutation
+  const pending = new Map();
+  let nextId = 0;
+  let flushTimer = null;
+
+  const flush = () => {
+    flushTimer = null;
+    if (!pending.size) return;
+    socket.send(JSON.stringify({ mutations: [...pending.values()] }));
+    pending.clear();
+  };
+
+  const enqueue = (mutation) => {
+    pending.set(mutation.todo_id, { id: String(nextId++), ...mutation });
+    flushTimer ??= setTimeout(flush, FLUSH_DELAY_MS);
+  };
+
+  const replaceById = (html) => {
+    const template = document.createElement("template");
+    template.innerHTML = html.trim();
+    const element = template.content.firstElementChild;
+    document.getElementById(element.id)?.replaceWith(element);
+    htmx.process(element);
+  };
+
+  socket.addEventListener("message", (event) => {
+    const { acks = [], fragments = [] } = JSON.parse(event.data);
+    if (acks.some((ack) => ack.status_code !== 200)) {
+      // Resync with the server, or redirect to login if the session expired
+      window.location.reload();
+      return;
+    }
+    acks.forEach((ack) => ack.html && replaceById(ack.html));
+    fragments.forEach(replaceById);
+  });
+
+  // Route htmx todo edits through the socket while it is open
+  document.body.addEventListener("htmx:confirm", (event) => {
+    const { verb, elt } = event.detail;
+    if (socket.readyState !== WebSocket.OPEN || !list.contains(elt)) return;
+    const form = elt.closest("form");
+    if (!form || !form.elements.todo_id) return;
+    const todoId = Number(form.elements.todo_id.value);
+
+    if (verb === "patch") {
+      event.preventDefault();
+      enqueue({
+        op: "update",
+        todo_id: todoId,
+        title: form.elements.title.value,
+        completed: form.elements.completed.checked,
+      });
+    } else if (verb === "delete") {
+      event.preventDefault();
+      enqueue({ op: "delete", todo_id: todoId });
+      elt.closest("li").remove();
+    }
+  });
+})();
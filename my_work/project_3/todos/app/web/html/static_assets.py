@@ -0,0 +1,89 @@
+"""Fingerprinted static assets.
+
+`scripts/build_static.py` copies each file under `static/` to
+`static/dist/` with a content hash in its name, alongside precompressed
+`.gz`/`.br` variants, and records the mapping in `dist/manifest.json`.
+Templates link assets with `static_url()`, and `CachedStaticFiles` serves
+fingerprinted files as immutable so browsers never revalidate them.
+"""
+import functools
+import json
+import stat
+from typing import Any
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from jinja2 import pass_context
+from starlette.datastructures import URL, Headers
+from starlette.responses import Response
+from starlette.types import Scope
+
+from app.web.html.const import STATIC_DIR
+
+DIST_DIR = STATIC_DIR / "dist"
+MANIFEST_PATH = DIST_DIR / "manifest.json"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+NO_CACHE_CACHE_CONTROL = "no-cache"
+# Preferred encoding first
+PRECOMPRESSED_SUFFIXES = (("br", ".br"), ("gzip", ".gz"))
+
+
+@functools.cache
+def get_manifest() -> dict[str, str]:
+    """Get the logical path -> fingerprinted path mapping, loaded once."""
+    try:
+        return json.loads(MANIFEST_PATH.read_text())
+    except FileNotFoundError:
+        return {}
+
+
+@functools.cache
+def get_fingerprinted_paths() -> frozenset[str]:
+    """Get the fingerprinted paths, relative to the static directory."""
+    return frozenset(get_manifest().values())
+
+
+@pass_context
+def static_url(context: dict[str, Any], path: str) -> URL:
+    """Get the url of a static asset, fingerprinted if it has been built."""
+    request = context["request"]
+    return request.url_for("html:static", path=get_manifest().get(path, path))
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with cache headers and precompressed variants."""
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        fingerprinted = path in get_fingerprinted_paths()
+        response = None
+        if fingerprinted and scope["method"] in ("GET", "HEAD"):
+            response = await self._get_precompressed_response(path, scope)
+        if response is None:
+            response = await super().get_response(path, scope)
+        response.headers["Cache-Control"] = (
+            IMMUTABLE_CACHE_CONTROL if fingerprinted else NO_CACHE_CACHE_CONTROL
+        )
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    async def _get_precompressed_response(
+        self, path: str, scope: Scope
+    ) -> Response | None:
+        """Get a `.br` or `.gz` variant of the file, if the client accepts it."""
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        accepted = {
+            encoding.split(";")[0].strip() for encoding in accept_encoding.split(",")
+        }
+        for encoding, suffix in PRECOMPRESSED_SUFFIXES:
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(
+                self.lookup_path, path + suffix
+            )
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                # The media type is guessed from the name, ignoring the suffix
+                response = self.file_response(full_path, stat_result, scope)
+                response.headers["Content-Encoding"] = encoding
+                return response
+        return None
@@ -0,0 +1,69 @@
+"""Opt-in streaming template renderer.
+
+`templates.TemplateResponse` renders the whole page before sending a byte.
+`stream_template` renders with Jinja's async generator instead, so the page
+head and navbar are flushed while the rest of the page is still rendering.
+"""
+from typing import Any
+
+from fastapi import Request, status
+from fastapi.responses import StreamingResponse
+from fastapi.templating import Jinja2Templates
+from markupsafe import Markup
+
+from app.web.html import flash_messages, static_assets
+from app.web.html.const import TEMPLATES_DIR
+
+FLASHED_MESSAGES = "flashed_messages"
+
+streaming_templates = Jinja2Templates(directory=TEMPLATES_DIR, enable_async=True)
+
+
+async def render_partial(template_name: str, **data: Any) -> Markup:
+    """Async counterpart of `jinja_partials.render_partial`."""
+    template = streaming_templates.get_template(template_name)
+    return Markup(await template.render_async(**data))
+
+
+def get_prefetched_flashed_messages(
+    request: Request,
+) -> list[flash_messages.FlashMessage]:
+    """Get the flashed messages popped before the response started.
+
+    The session cookie is written with the response headers, so messages
+    must be popped before streaming begins or they would be shown again.
+    """
+    return getattr(request.state, FLASHED_MESSAGES, [])
+
+
+streaming_templates.env.globals["render_partial"] = render_partial
+streaming_templates.env.globals[
+    "get_flashed_messages"
+] = get_prefetched_flashed_messages
+streaming_templates.env.globals["static_url"] = static_assets.static_url
+
+
+def stream_template(
+    name: str,
+    context: dict[str, Any],
+    status_code: int = status.HTTP_200_OK,
+    headers: dict[str, str] | None = None,
+) -> StreamingResponse:
+    """Stream a template to the client as it renders.
+
+    Context values may be async iterables, which are consumed lazily by
+    `{% for %}` loops once the preceding markup has been sent.
+    """
+    request: Request = context["request"]
+    setattr(
+        request.state,
+        FLASHED_MESSAGES,
+        flash_messages.get_flashed_messages(request),
+    )
+    template = streaming_templates.get_template(name)
+    return StreamingResponse(
+        template.generate_async(context),
+        status_code=status_code,
+        headers=headers,
+        media_type="text/html",
+    )
@@ -0,0 +1,113 @@
+"""JWT libraries for encoding and decoding access tokens.
+
+Every token is encoded and decoded, so the JWT library sits on the hot path
+of each authenticated request. The library is chosen with `JWT_BACKEND`;
+compare them on this host with `python -m scripts.benchmark_jwt`. Each
+library is imported when its backend is first used, keeping it off the
+app's startup path.
+"""
+import functools
+import os
+from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from typing import Any
+
+from app.web.signing_keys import SigningKey
+
+JWT_BACKEND = os.environ.get("JWT_BACKEND", "jose")
+
+
+class InvalidTokenError(Exception):
+    """The token is malformed, expired or has a bad signature."""
+
+
+class JWTBackend(ABC):
+    """Interface for a JWT library."""
+
+    @abstractmethod
+    def encode(self, claims: Mapping[str, Any], key: SigningKey) -> str:
+        """Sign the claims with the key, naming it in the `kid` header."""
+
+    @abstractmethod
+    def get_kid(self, token: str) -> str:
+        """Get the `kid` header without verifying the token."""
+
+    @abstractmethod
+    def decode(self, token: str, key: SigningKey) -> dict[str, Any]:
+        """Verify the token with the key and get its validated claims."""
+
+
+class JoseBackend(JWTBackend):
+    """python-jose, signing with the jose keys parsed when the key set loads."""
+
+    def __init__(self) -> None:
+        from jose import JOSEError
+        from jose import jwt as jose_jwt
+
+        self.jwt = jose_jwt
+        self.error = JOSEError
+
+    def encode(self, claims: Mapping[str, Any], key: SigningKey) -> str:
+        return self.jwt.encode(
+            claims=dict(claims),
+            key=key.signing_jwk,
+            algorithm=key.algorithm,
+            headers={"kid": key.kid},
+        )
+
+    def get_kid(self, token: str) -> str:
+        try:
+            return self.jwt.get_unverified_header(token).get("kid", "")
+        except self.error as e:
+            raise InvalidTokenError from e
+
+    def decode(self, token: str, key: SigningKey) -> dict[str, Any]:
+        try:
+            return self.jwt.decode(token, key.verifying_jwk, algorithms=[key.algorithm])
+        except self.error as e:
+            raise InvalidTokenError from e
+
+
+class PyJWTBackend(JWTBackend):
+    """PyJWT, signing with the cryptography keys directly."""
+
+    def __init__(self) -> None:
+        try:
+            import jwt as pyjwt
+        except ImportError as e:  # pragma: no cover - PyJWT is optional
+            raise RuntimeError("The pyjwt JWT backend requires PyJWT") from e
+
+        self.jwt = pyjwt
+
+    def encode(self, claims: Mapping[str, Any], key: SigningKey) -> str:
+        return self.jwt.encode(
+            payload=dict(claims),
+            key=key.private_key,
+            algorithm=key.algorithm,
+            headers={"kid": key.kid},
+        )
+
+    def get_kid(self, token: str) -> str:
+        try:
+            return self.jwt.get_unverified_header(token).get("kid", "")
+        except self.jwt.PyJWTError as e:
+            raise InvalidTokenError from e
+
+    def decode(self, token: str, key: SigningKey) -> dict[str, Any]:
+        try:
+            return self.jwt.decode(token, key.public_key, algorithms=[key.algorithm])
+        except self.jwt.PyJWTError as e:
+            raise InvalidTokenError from e
+
+
+BACKENDS: dict[str, type[JWTBackend]] = {
+    "jose": JoseBackend,
+    "pyjwt": PyJWTBackend,
+}
+
+
+@functools.cache
+def get_backend(name: str = JWT_BACKEND) -> JWTBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JWT backend {name}, choose from {list(BACKENDS)}")
+    return BACKENDS[name]()
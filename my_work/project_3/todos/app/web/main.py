@@ -1,20 +1,58 @@
+import contextlib
+import logging
+import os
+import time
+from collections.abc import AsyncIterator
+
 from fastapi import FastAPI, Request
 from fastapi.responses import RedirectResponse
 from starlette.middleware.sessions import SessionMiddleware
 
-from app.datastore import db_models
-from app.datastore.database import engine
+from app import IMPORT_START
+from app.datastore import db_models, group_commit, purge, schema, sharding
+from app.datastore.database import engine, shard_engines
 from app.web.api import main as api_main
 from app.web.html import main as html_main
 
 SESSION_SECRET = "SUPER-SECRET-KEY"
-
-app = FastAPI()
+# In production, the database must be migrated to the Alembic head revision.
+# Elsewhere, missing tables are created at startup instead.
+ENVIRONMENT = os.environ.get("ENVIRONMENT", "development")
+
+IMPORT_TIME = time.perf_counter() - IMPORT_START
+# Logged alongside uvicorn's own startup messages
+logger = logging.getLogger("uvicorn.error")
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Prepare the database and start the purger on startup.
+
+    The purger and the writer are stopped on shutdown.
+    """
+    start = time.perf_counter()
+    if ENVIRONMENT == "production":
+        schema.verify_revision(engine)
+    else:
+        db_models.Base.metadata.create_all(bind=engine)
+    # Shards aren't migrated with Alembic
+    sharding.create_shard_tables(shard_engines)
+    purge.purger.start()
+    logger.info(
+        "App imported in %.0fms, started in %.0fms",
+        IMPORT_TIME * 1000,
+        (time.perf_counter() - start) * 1000,
+    )
+    yield
+    await purge.purger.close()
+    if group_commit.writer:
+        await group_commit.writer.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET)
 
-db_models.Base.metadata.create_all(bind=engine)
-
 
 @app.get("/api")
 async def api_home(request: Request):
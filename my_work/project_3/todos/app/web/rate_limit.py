@@ -0,0 +1,99 @@
+"""Rate and concurrency limits for login.
+
+Every login runs a deliberately slow password hash, so a credential
+stuffing burst could tie up every worker. Logins are limited per client ip
+and per username with token buckets, and the number of concurrent password
+verifications is capped. Both checks raise `TooManyRequestsError` before
+any hashing happens.
+"""
+import asyncio
+import contextlib
+import time
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+from typing import NamedTuple
+
+from app.web import errors
+
+
+class RateLimit(NamedTuple):
+    """Allow bursts of `capacity` requests, refilling over `per_seconds`."""
+
+    capacity: int
+    per_seconds: float
+
+    @property
+    def refill_rate(self) -> float:
+        return self.capacity / self.per_seconds
+
+
+class RateLimitBackend(ABC):
+    """Token bucket storage, shared between workers by non-memory backends."""
+
+    @abstractmethod
+    async def acquire(self, key: str, limit: RateLimit) -> float:
+        """Take a token from the key's bucket.
+
+        Return 0 if a token was taken, otherwise the seconds until one
+        is available.
+        """
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Token buckets for a single process."""
+
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self.max_keys = max_keys
+        # key -> (tokens, updated at, full at)
+        self.buckets: dict[str, tuple[float, float, float]] = {}
+
+    async def acquire(self, key: str, limit: RateLimit) -> float:
+        now = time.monotonic()
+        tokens, updated_at, _ = self.buckets.get(key, (limit.capacity, now, now))
+        tokens = min(limit.capacity, tokens + (now - updated_at) * limit.refill_rate)
+        retry_after = 0.0
+        if tokens < 1:
+            retry_after = (1 - tokens) / limit.refill_rate
+        else:
+            tokens -= 1
+        full_at = now + (limit.capacity - tokens) / limit.refill_rate
+        self.buckets[key] = (tokens, now, full_at)
+        if len(self.buckets) > self.max_keys:
+            self._prune(now)
+        return retry_after
+
+    def _prune(self, now: float) -> None:
+        """Drop full buckets, which behave the same as missing ones."""
+        self.buckets = {
+            key: bucket for key, bucket in self.buckets.items() if bucket[2] > now
+        }
+
+
+# ----------- Login limits -----------
+IP_LOGIN_LIMIT = RateLimit(capacity=20, per_seconds=60)
+USERNAME_LOGIN_LIMIT = RateLimit(capacity=5, per_seconds=60)
+MAX_CONCURRENT_PASSWORD_VERIFICATIONS = 4
+BUSY_RETRY_AFTER = 1
+
+backend: RateLimitBackend = InMemoryRateLimitBackend()
+password_verification_semaphore = asyncio.Semaphore(
+    MAX_CONCURRENT_PASSWORD_VERIFICATIONS
+)
+
+
+@contextlib.asynccontextmanager
+async def login_attempt(client_ip: str | None, username: str) -> AsyncIterator[None]:
+    """Guard a password verification with the login limits."""
+    retry_after = max(
+        await backend.acquire(f"login:ip:{client_ip}", IP_LOGIN_LIMIT),
+        await backend.acquire(
+            f"login:username:{username.lower()}", USERNAME_LOGIN_LIMIT
+        ),
+    )
+    if retry_after:
+        raise errors.TooManyRequestsError(retry_after=retry_after)
+    # Shed load rather than queue requests behind a saturated hasher
+    if password_verification_semaphore.locked():
+        raise errors.TooManyRequestsError(retry_after=BUSY_RETRY_AFTER)
+    async with password_verification_semaphore:
+        yield
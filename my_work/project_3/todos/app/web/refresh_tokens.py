@@ -0,0 +1,126 @@
+"""Opaque, rotating refresh tokens.
+
+A login starts a token family, whose id is also the `jti` of the access
+tokens issued with it. Refresh tokens are random with 256 bits of entropy,
+so storing their SHA-256 digest is enough; refreshing never runs the slow
+password hash.
+
+Each refresh marks the presented token used and issues its successor. A
+used token presented again means it was copied, so its whole family is
+revoked, along with the family's access tokens.
+"""
+import hashlib
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import Session
+
+from app.datastore import db_models
+from app.datastore.database import session_scope
+from app.web import errors, revocation
+
+REFRESH_TOKEN_EXPIRATION = timedelta(days=30)
+# Concurrent requests may present a token while its successor is in flight
+REUSE_GRACE_PERIOD = timedelta(seconds=10)
+
+
+def new_family_id() -> str:
+    return secrets.token_urlsafe(16)
+
+
+def issue_refresh_token(db: Session, user_id: int, family_id: str) -> str:
+    """Add a refresh token to the family, committed with the session."""
+    refresh_token = secrets.token_urlsafe(32)
+    db.add(
+        db_models.RefreshToken(
+            token_hash=_hash_token(refresh_token),
+            family_id=family_id,
+            user_id=user_id,
+            expires_at=_utcnow() + REFRESH_TOKEN_EXPIRATION,
+        )
+    )
+    return refresh_token
+
+
+async def rotate_refresh_token(
+    db: Session, refresh_token: str, access_token_ttl: timedelta
+) -> tuple[db_models.User, str, str]:
+    """Use up the refresh token and issue its successor.
+
+    Return the user, the family id and the new refresh token.
+    """
+    now = _utcnow()
+    token_model = (
+        db.query(db_models.RefreshToken)
+        .filter(db_models.RefreshToken.token_hash == _hash_token(refresh_token))
+        .first()
+    )
+    if not token_model or token_model.revoked or token_model.expires_at <= now:
+        raise errors.UserNotValidatedError
+    if token_model.used_at:
+        if now - token_model.used_at < REUSE_GRACE_PERIOD:
+            raise errors.RefreshTokenInUseError
+        await _revoke_reused_family(token_model.family_id, access_token_ttl)
+        raise errors.UserNotValidatedError
+
+    # Claim the token atomically, so concurrent refreshes can't both rotate it
+    claimed = (
+        db.query(db_models.RefreshToken)
+        .filter(
+            db_models.RefreshToken.id == token_model.id,
+            db_models.RefreshToken.used_at.is_(None),
+        )
+        .update({db_models.RefreshToken.used_at: now})
+    )
+    if not claimed:
+        raise errors.RefreshTokenInUseError
+    new_refresh_token = issue_refresh_token(
+        db, user_id=token_model.user_id, family_id=token_model.family_id
+    )
+    return token_model.user, token_model.family_id, new_refresh_token
+
+
+def revoke_family(db: Session, family_id: str) -> None:
+    """Revoke every refresh token in the family, committed with the session."""
+    db.query(db_models.RefreshToken).filter(
+        db_models.RefreshToken.family_id == family_id
+    ).update({db_models.RefreshToken.revoked: True})
+
+
+def revoke_user_refresh_tokens(db: Session, user_id: int) -> None:
+    """Revoke every refresh token of the user, committed with the session."""
+    db.query(db_models.RefreshToken).filter(
+        db_models.RefreshToken.user_id == user_id
+    ).update({db_models.RefreshToken.revoked: True})
+
+
+def get_family_id(db: Session, refresh_token: str) -> str | None:
+    return (
+        db.query(db_models.RefreshToken.family_id)
+        .filter(db_models.RefreshToken.token_hash == _hash_token(refresh_token))
+        .scalar()
+    )
+
+
+# ------------ Helpers ------------
+def _hash_token(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+
+def _utcnow() -> datetime:
+    """Get the naive UTC time, as the database stores it."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def _revoke_reused_family(family_id: str, access_token_ttl: timedelta) -> None:
+    """Revoke a family on token reuse.
+
+    The revocation gets its own transaction, since the request's is rolled
+    back when it fails with the authentication error.
+    """
+    with session_scope() as db:
+        revoke_family(db, family_id)
+    await revocation.store.revoke_token(
+        family_id, expires_at=time.time() + access_token_ttl.total_seconds()
+    )
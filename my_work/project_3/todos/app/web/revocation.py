@@ -0,0 +1,253 @@
+"""Revocation of issued access tokens.
+
+Routes that trust the token claims (see `auth.TokenClaimsUser`) never load
+the user row, so a token would otherwise keep a deleted user, or a user's
+old role, valid until it expires. Revoking a user's tokens rejects every
+token issued to them up to that moment, and revoking a token (on logout)
+rejects its `jti`, in `auth.parse_access_token`.
+
+Almost no token checked is revoked, so the store is wrapped in a
+`BloomFilteredRevocationStore`, which only looks up the tokens in its
+`BloomFilter`, and the users in its set of revoked users, in the store.
+"""
+import hashlib
+import math
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+
+# Sized for this many revoked, unexpired tokens at this false positive rate
+BLOOM_FILTER_CAPACITY = 100_000
+BLOOM_FILTER_ERROR_RATE = 0.01
+# Expired entries are dropped, and the bloom filter rebuilt, at most this often
+COMPACTION_INTERVAL = 60
+# For stores shared between workers, the filters are rebuilt this often to
+# pick up the revocations made by other workers
+SHARED_FILTER_REFRESH_SECONDS = 5
+
+
+class BloomFilter:
+    """Set membership with false positives but no false negatives.
+
+    Items can't be removed, so rebuild the filter to forget them.
+    """
+
+    def __init__(
+        self,
+        capacity: int = BLOOM_FILTER_CAPACITY,
+        error_rate: float = BLOOM_FILTER_ERROR_RATE,
+    ) -> None:
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(math.ceil(self.size / 8))
+
+    @classmethod
+    def from_items(cls, items: Iterable[str], capacity: int) -> "BloomFilter":
+        bloom_filter = cls(capacity=capacity)
+        for item in items:
+            bloom_filter.add(item)
+        return bloom_filter
+
+    def add(self, item: str) -> None:
+        for index in self._indexes(item):
+            self.bits[index // 8] |= 1 << (index % 8)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[index // 8] & (1 << (index % 8)) for index in self._indexes(item)
+        )
+
+    def _indexes(self, item: str) -> list[int]:
+        """Derive every bit index from two halves of a single digest."""
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:], "big")
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+
+class RevocationStore(ABC):
+    """Storage for revocations, shared between workers by non-memory stores."""
+
+    @abstractmethod
+    async def revoke_user(self, user_id: int, ttl: float) -> None:
+        """Revoke every token issued to the user until now.
+
+        Tokens live at most `ttl` seconds, after which the entry can be
+        forgotten.
+        """
+
+    @abstractmethod
+    async def is_user_revoked(self, user_id: int, issued_at: float) -> bool:
+        """Check whether a token issued to the user at `issued_at` is revoked."""
+
+    @abstractmethod
+    async def revoke_token(self, token_id: str, expires_at: float) -> None:
+        """Revoke a single token by its `jti` until it expires."""
+
+    @abstractmethod
+    async def is_token_revoked(self, token_id: str) -> bool:
+        """Check whether the token with this `jti` is revoked."""
+
+    @abstractmethod
+    async def get_revoked_token_ids(self) -> list[str]:
+        """Get the `jti` of every revoked token that hasn't expired."""
+
+    @abstractmethod
+    async def get_revoked_user_ids(self) -> list[int]:
+        """Get the id of every user with revoked tokens that haven't expired."""
+
+    @abstractmethod
+    async def compact(self) -> None:
+        """Forget revocations whose tokens have all expired."""
+
+
+class InMemoryRevocationStore(RevocationStore):
+    """Revocations for a single process."""
+
+    def __init__(self) -> None:
+        # user id -> (revoked at, forget at)
+        self.revoked_users: dict[int, tuple[float, float]] = {}
+        # token id -> expires at
+        self.revoked_tokens: dict[str, float] = {}
+
+    async def revoke_user(self, user_id: int, ttl: float) -> None:
+        now = time.time()
+        self.revoked_users[user_id] = (now, now + ttl)
+
+    async def is_user_revoked(self, user_id: int, issued_at: float) -> bool:
+        if not (revocation := self.revoked_users.get(user_id)):
+            return False
+        return issued_at <= revocation[0]
+
+    async def revoke_token(self, token_id: str, expires_at: float) -> None:
+        self.revoked_tokens[token_id] = expires_at
+
+    async def is_token_revoked(self, token_id: str) -> bool:
+        return token_id in self.revoked_tokens
+
+    async def get_revoked_token_ids(self) -> list[str]:
+        now = time.time()
+        return [
+            token_id
+            for token_id, expires_at in self.revoked_tokens.items()
+            if expires_at > now
+        ]
+
+    async def get_revoked_user_ids(self) -> list[int]:
+        now = time.time()
+        return [
+            user_id
+            for user_id, (_, forget_at) in self.revoked_users.items()
+            if forget_at > now
+        ]
+
+    async def compact(self) -> None:
+        now = time.time()
+        self.revoked_users = {
+            user_id: revocation
+            for user_id, revocation in self.revoked_users.items()
+            if revocation[1] > now
+        }
+        self.revoked_tokens = {
+            token_id: expires_at
+            for token_id, expires_at in self.revoked_tokens.items()
+            if expires_at > now
+        }
+
+
+class BloomFilteredRevocationStore(RevocationStore):
+    """Wraps a store, skipping its lookup for tokens that aren't revoked.
+
+    Revocations made through this wrapper are added to its filters at once.
+    Those made by other workers of a shared store are picked up when the
+    filters are rebuilt from the store, every `refresh_interval` seconds,
+    by default SHARED_FILTER_REFRESH_SECONDS unless the store is in memory.
+    """
+
+    def __init__(
+        self, backend: RevocationStore, refresh_interval: float | None = None
+    ) -> None:
+        self.backend = backend
+        if refresh_interval is None:
+            refresh_interval = (
+                COMPACTION_INTERVAL
+                if isinstance(backend, InMemoryRevocationStore)
+                else SHARED_FILTER_REFRESH_SECONDS
+            )
+        self.refresh_interval = refresh_interval
+        self.token_filter = BloomFilter()
+        # Few users are revoked at once, so a set is small enough
+        self.revoked_user_ids: set[int] = set()
+        self.refreshed_at = time.time()
+        # Revocations made while the filters are being rebuilt, if they are
+        self._refreshing = False
+        self._tokens_revoked_during_refresh: list[str] = []
+        self._users_revoked_during_refresh: list[int] = []
+        self.compacted_at = time.time()
+
+    async def revoke_user(self, user_id: int, ttl: float) -> None:
+        await self.backend.revoke_user(user_id, ttl)
+        self.revoked_user_ids.add(user_id)
+        if self._refreshing:
+            self._users_revoked_during_refresh.append(user_id)
+        await self._maybe_compact()
+
+    async def is_user_revoked(self, user_id: int, issued_at: float) -> bool:
+        await self._maybe_refresh()
+        if user_id not in self.revoked_user_ids:
+            return False
+        return await self.backend.is_user_revoked(user_id, issued_at)
+
+    async def revoke_token(self, token_id: str, expires_at: float) -> None:
+        await self.backend.revoke_token(token_id, expires_at)
+        self.token_filter.add(token_id)
+        if self._refreshing:
+            self._tokens_revoked_during_refresh.append(token_id)
+        await self._maybe_compact()
+
+    async def is_token_revoked(self, token_id: str) -> bool:
+        await self._maybe_refresh()
+        if token_id not in self.token_filter:
+            return False
+        return await self.backend.is_token_revoked(token_id)
+
+    async def get_revoked_token_ids(self) -> list[str]:
+        return await self.backend.get_revoked_token_ids()
+
+    async def get_revoked_user_ids(self) -> list[int]:
+        return await self.backend.get_revoked_user_ids()
+
+    async def compact(self) -> None:
+        await self.backend.compact()
+        await self.refresh_filter()
+        self.compacted_at = time.time()
+
+    async def refresh_filter(self) -> None:
+        """Rebuild the filters from the store, forgetting expired entries."""
+        self._refreshing = True
+        try:
+            token_ids = await self.backend.get_revoked_token_ids()
+            user_ids = await self.backend.get_revoked_user_ids()
+            token_ids += self._tokens_revoked_during_refresh
+            user_ids += self._users_revoked_during_refresh
+        finally:
+            self._refreshing = False
+            self._tokens_revoked_during_refresh = []
+            self._users_revoked_during_refresh = []
+        self.token_filter = BloomFilter.from_items(
+            token_ids, capacity=max(BLOOM_FILTER_CAPACITY, 2 * len(token_ids))
+        )
+        self.revoked_user_ids = set(user_ids)
+        self.refreshed_at = time.time()
+
+    async def _maybe_refresh(self) -> None:
+        if time.time() - self.refreshed_at >= self.refresh_interval:
+            await self.refresh_filter()
+
+    async def _maybe_compact(self) -> None:
+        """Compact on writes, which are the only way entries accumulate."""
+        if time.time() - self.compacted_at >= COMPACTION_INTERVAL:
+            await self.compact()
+
+
+store: RevocationStore = BloomFilteredRevocationStore(InMemoryRevocationStore())
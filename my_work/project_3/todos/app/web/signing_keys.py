@@ -0,0 +1,154 @@
+"""Asymmetric keys for signing access tokens.
+
+Tokens are signed with the newest key in `KEYS_DIR` and name it in their
+`kid` header. Every key in the directory still verifies tokens, so rotate
+by adding a key with `python -m scripts.rotate_signing_keys` and removing
+old keys once the tokens they signed have expired. The public keys are
+published as a JWKS at `GET /api/auth/jwks.json`, letting other services
+verify tokens locally.
+
+cryptography and jose are imported when the keys first load, keeping them
+off the app's startup path.
+"""
+import os
+import secrets
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+if TYPE_CHECKING:
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+    from jose import jwk
+
+    PrivateKey = rsa.RSAPrivateKey | ec.EllipticCurvePrivateKey
+
+KEYS_DIR = Path(
+    os.environ.get("JWT_KEYS_DIR", Path(__file__).parent.parent.parent / "keys")
+)
+# Algorithm for new keys, RS256 or ES256
+ALGORITHM = os.environ.get("JWT_ALGORITHM", "RS256")
+# Pick up keys rotated in by another process
+KEY_SET_REFRESH_SECONDS = 300
+# Least time between reloads for tokens signed with an unknown key
+UNKNOWN_KID_REFRESH_SECONDS = 10
+RSA_KEY_SIZE = 2048
+
+
+class SigningKey(NamedTuple):
+    """A key pair, parsed once when the key set loads."""
+
+    kid: str
+    algorithm: str
+    private_key: "PrivateKey"
+    public_key: Any
+    signing_jwk: "jwk.Key"
+    verifying_jwk: "jwk.Key"
+
+    @classmethod
+    def from_pem(cls, kid: str, pem: bytes) -> "SigningKey":
+        from cryptography.hazmat.primitives import serialization
+        from jose import jwk
+
+        private_key = serialization.load_pem_private_key(pem, password=None)
+        algorithm = _get_algorithm(private_key)
+        signing_jwk = jwk.construct(pem, algorithm)
+        return cls(
+            kid=kid,
+            algorithm=algorithm,
+            private_key=private_key,  # type: ignore[arg-type]
+            public_key=private_key.public_key(),
+            signing_jwk=signing_jwk,
+            verifying_jwk=signing_jwk.public_key(),
+        )
+
+    def to_jwk(self) -> dict[str, str]:
+        """Get the public key as a JWK."""
+        return {**self.verifying_jwk.to_dict(), "kid": self.kid, "use": "sig"}
+
+
+class KeySet:
+    """Signing keys loaded from a directory and cached between reloads."""
+
+    def __init__(self, keys_dir: Path = KEYS_DIR) -> None:
+        self.keys_dir = keys_dir
+        self.keys: dict[str, SigningKey] = {}
+        # Never loaded, so the first use loads the keys
+        self.loaded_at = float("-inf")
+
+    @property
+    def current(self) -> SigningKey:
+        """Get the newest key, which signs new tokens."""
+        self._refresh(KEY_SET_REFRESH_SECONDS)
+        return self.keys[max(self.keys)]
+
+    def get(self, kid: str) -> SigningKey | None:
+        """Get a key to verify a token with."""
+        self._refresh(KEY_SET_REFRESH_SECONDS)
+        if kid not in self.keys:
+            self._refresh(UNKNOWN_KID_REFRESH_SECONDS)
+        return self.keys.get(kid)
+
+    def jwks(self) -> dict[str, list[dict[str, str]]]:
+        self._refresh(KEY_SET_REFRESH_SECONDS)
+        return {"keys": [key.to_jwk() for key in self.keys.values()]}
+
+    def _refresh(self, max_age: float) -> None:
+        if time.monotonic() - self.loaded_at < max_age:
+            return
+        self.keys = load_keys(self.keys_dir)
+        if not self.keys:
+            write_key(self.keys_dir)
+            self.keys = load_keys(self.keys_dir)
+        self.loaded_at = time.monotonic()
+
+
+def load_keys(keys_dir: Path) -> dict[str, SigningKey]:
+    """Load the keys, named `<kid>.pem`, by kid."""
+    keys = {}
+    for path in sorted(keys_dir.glob("*.pem")):
+        keys[path.stem] = SigningKey.from_pem(kid=path.stem, pem=path.read_bytes())
+    return keys
+
+
+def write_key(keys_dir: Path = KEYS_DIR, algorithm: str = ALGORITHM) -> Path:
+    """Generate a new key, which sorts after every existing key."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+    if algorithm == "RS256":
+        private_key: PrivateKey = rsa.generate_private_key(
+            public_exponent=65537, key_size=RSA_KEY_SIZE
+        )
+    elif algorithm == "ES256":
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    else:
+        raise ValueError(f"Unsupported signing algorithm {algorithm}")
+    kid = f"{datetime.now(timezone.utc):%Y%m%d%H%M%S}-{secrets.token_hex(4)}"
+    path = keys_dir / f"{kid}.pem"
+    keys_dir.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(
+        private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+    )
+    path.chmod(0o600)
+    return path
+
+
+key_set = KeySet()
+
+
+# ------------ Helpers ------------
+def _get_algorithm(private_key: Any) -> str:
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+    if isinstance(private_key, rsa.RSAPrivateKey):
+        return "RS256"
+    if isinstance(private_key, ec.EllipticCurvePrivateKey) and isinstance(
+        private_key.curve, ec.SECP256R1
+    ):
+        return "ES256"
+    raise ValueError(f"Unsupported signing key type {type(private_key).__name__}")
@@ -29,9 +29,18 @@ class CurrentUser(BaseModel, mixins.AuthUserMixin):
     phone_number: ft.Min3Field | None = None
 
 
+class TokenUser(BaseModel, mixins.AuthUserMixin):
+    """User built from access token claims or a cached API key lookup"""
+
+    id: int
+    username: str
+    role: Role
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str | None = None
 
 
 # ----------- User Models -----------
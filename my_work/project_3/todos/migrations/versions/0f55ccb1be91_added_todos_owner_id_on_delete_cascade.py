@@ -0,0 +1,25 @@
+"""added todos owner_id on delete cascade
+
+Revision ID: 0f55ccb1be91
+Revises: daa0089aa828
+Create Date: 2026-10-19 17:34:41.432171
+
+"""
+from typing import Sequence, Union
+
+from app.datastore import online_migrations
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0f55ccb1be91'
+down_revision: Union[str, None] = 'daa0089aa828'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    online_migrations.replace_foreign_key('todos_owner_id_fkey', 'todos', 'users', ['owner_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    online_migrations.replace_foreign_key('todos_owner_id_fkey', 'todos', 'users', ['owner_id'], ['id'])
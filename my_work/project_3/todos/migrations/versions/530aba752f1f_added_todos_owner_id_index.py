@@ -0,0 +1,25 @@
+"""added todos owner_id index
+
+Revision ID: 530aba752f1f
+Revises: 8025001941a0
+Create Date: 2026-10-19 17:25:48.243188
+
+"""
+from typing import Sequence, Union
+
+from app.datastore import online_migrations
+
+
+# revision identifiers, used by Alembic.
+revision: str = '530aba752f1f'
+down_revision: Union[str, None] = '8025001941a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    online_migrations.create_index_concurrently('ix_todos_owner_id_id', 'todos', ['owner_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    online_migrations.drop_index_concurrently('ix_todos_owner_id_id', table_name='todos')
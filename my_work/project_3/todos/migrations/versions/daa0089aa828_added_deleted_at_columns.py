@@ -0,0 +1,34 @@
+"""added deleted_at columns
+
+Revision ID: daa0089aa828
+Revises: 4fae68781b52
+Create Date: 2026-10-19 17:31:31.439144
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.datastore import online_migrations
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'daa0089aa828'
+down_revision: Union[str, None] = '4fae68781b52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('todos', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.add_column('users', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    online_migrations.create_index_concurrently(op.f('ix_todos_deleted_at'), 'todos', ['deleted_at'], unique=False)
+    online_migrations.create_index_concurrently(op.f('ix_users_deleted_at'), 'users', ['deleted_at'], unique=False)
+
+
+def downgrade() -> None:
+    online_migrations.drop_index_concurrently(op.f('ix_users_deleted_at'), table_name='users')
+    online_migrations.drop_index_concurrently(op.f('ix_todos_deleted_at'), table_name='todos')
+    op.drop_column('users', 'deleted_at')
+    op.drop_column('todos', 'deleted_at')
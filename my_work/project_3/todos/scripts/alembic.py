@@ -1,15 +1,19 @@
+import io
 import subprocess
 from pathlib import Path
 from typing import Annotated
 
 import typer
 
+from app.datastore import backfill, online_migrations
+
 BASE_ARGS_KEY = "base_args"
+CONFIG_FILE_KEY = "config_file"
 SQL_OPT = "--sql"
 DEFAULT_PATH = Path(__file__).parent.parent / "migrations" / "alembic.ini"
 BASE_ARGS = ["alembic", "--config"]
 
-state = {BASE_ARGS_KEY: BASE_ARGS}
+state: dict = {BASE_ARGS_KEY: BASE_ARGS, CONFIG_FILE_KEY: DEFAULT_PATH}
 
 
 cli_app = typer.Typer(add_completion=False, no_args_is_help=True)
@@ -24,6 +28,7 @@ def callback(
 ) -> None:
     """Database migration tool."""
     state[BASE_ARGS_KEY] = BASE_ARGS + [str(config_file)]
+    state[CONFIG_FILE_KEY] = config_file
 
 
 @cli_app.command()
@@ -46,8 +51,17 @@ def upgrade(
             help="Show SQL statements generated by the upgrade process.",
         ),
     ] = False,
+    dry_run_plan: Annotated[
+        bool,
+        typer.Option(
+            help="Show the locks each statement would take, without upgrading.",
+        ),
+    ] = False,
 ) -> None:
     """Upgrade the database."""
+    if dry_run_plan:
+        print_lock_plan(config_file=state[CONFIG_FILE_KEY], revision=revision)
+        return
     args = state[BASE_ARGS_KEY] + ["upgrade", revision]
     if sql:
         args.append(SQL_OPT)
@@ -91,5 +105,93 @@ def current() -> None:
     subprocess.run(args)
 
 
+@cli_app.command("backfill")
+def run_backfill(
+    table: Annotated[str, typer.Argument(help="Table to update.")],
+    set_sql: Annotated[
+        str, typer.Option("--set", help="SET clause, e.g. \"phone_number = ''\".")
+    ],
+    where_sql: Annotated[
+        str | None, typer.Option("--where", help="Only update matching rows.")
+    ] = None,
+    name: Annotated[
+        str | None,
+        typer.Option(
+            help="Checkpoint name to resume by. Defaults to the table and SQL."
+        ),
+    ] = None,
+    key: Annotated[str, typer.Option(help="Integer key to batch by.")] = "id",
+    batch_size: Annotated[int, typer.Option(min=1)] = backfill.BATCH_SIZE,
+    sleep: Annotated[
+        float, typer.Option(min=0, help="Seconds to pause between batches.")
+    ] = backfill.BATCH_SLEEP,
+    restart: Annotated[
+        bool, typer.Option(help="Discard the checkpoint and start over.")
+    ] = False,
+) -> None:
+    """Backfill a table in batches, resuming from the last checkpoint."""
+    from alembic.config import Config
+    from sqlalchemy import create_engine
+
+    config = Config(str(state[CONFIG_FILE_KEY]))
+    engine = create_engine(config.get_main_option("sqlalchemy.url", ""))
+    job = backfill.Backfill(
+        name=name or backfill.default_name(table, set_sql, where_sql),
+        table=table,
+        set_sql=set_sql,
+        where_sql=where_sql,
+        key=key,
+    )
+    if restart:
+        backfill.reset_checkpoint(engine, job.name)
+
+    def report(progress: backfill.BackfillProgress) -> None:
+        typer.echo(
+            f"{progress.rows} rows up to {key} {progress.last_key},"
+            f" {progress.rows_per_second:.0f} rows/s"
+        )
+
+    progress = backfill.run_backfill(
+        engine, job, batch_size=batch_size, sleep=sleep, report=report
+    )
+    typer.echo(f"Backfill {job.name} completed: {progress.rows} rows")
+
+
+def print_lock_plan(config_file: Path, revision: str) -> None:
+    """Print the estimated locks of upgrading from the current revision."""
+    from alembic import command
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from sqlalchemy import create_engine
+
+    sql = io.StringIO()
+    config = Config(str(config_file), output_buffer=sql)
+    engine = create_engine(config.get_main_option("sqlalchemy.url", ""))
+    with engine.connect() as connection:
+        current = MigrationContext.configure(connection).get_current_revision()
+        command.upgrade(
+            config, f"{current}:{revision}" if current else revision, sql=True
+        )
+        impacts = online_migrations.plan_locks(sql.getvalue(), connection)
+    if not impacts:
+        typer.echo("Nothing to upgrade.")
+        return
+    typer.echo(
+        f"{'revision':<13} {'table':<16} {'rows':>9} {'lock':<23}"
+        f" {'blocks':<17} {'duration':<12} statement"
+    )
+    for impact in impacts:
+        rows = "?" if impact.rows is None else str(impact.rows)
+        typer.echo(
+            f"{impact.revision:<13} {impact.table or '-':<16} {rows:>9}"
+            f" {impact.lock:<23} {impact.blocks:<17} {impact.duration:<12}"
+            f" {impact.statement[:60]}"
+        )
+    if engine.dialect.name != "postgresql":
+        typer.echo(
+            f"\nLocks are PostgreSQL's; {engine.dialect.name} may lock differently."
+        )
+
+
 if __name__ == "__main__":
     cli_app()
@@ -0,0 +1,120 @@
+"""benchmark_cascade_delete: Compare deleting a user with many todos.
+
+Deletes a user owning `--todos` todos from a throwaway SQLite database, or
+from `--db-url`, in two modes:
+
+- orm: the session loads the user's todos and deletes them row by row, as
+  `User.todos` did with only `cascade="all, delete"`
+- database: the session deletes the user alone, and the database removes
+  the todos with its ON DELETE CASCADE, as `passive_deletes=True` does
+
+Prints the time taken and the statements sent for each mode.
+
+Run with `python -m scripts.benchmark_cascade_delete --help`
+"""
+import tempfile
+import time
+from pathlib import Path
+from typing import Annotated, Any
+
+import typer
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.datastore import database, db_models
+from app.permissions import Role
+
+INSERT_BATCH_SIZE = 10_000
+
+cli_app = typer.Typer(add_completion=False)
+
+
+def _add_user_with_todos(bench_engine: Engine, todos: int) -> int:
+    with bench_engine.begin() as connection:
+        user_id = connection.execute(
+            insert(db_models.User)
+            .values(
+                email="cascade@example.com",
+                username="cascade",
+                first_name="Bench",
+                last_name="Mark",
+                hashed_password="not-a-hash",
+                role=Role.USER,
+                is_active=True,
+            )
+            .returning(db_models.User.id)
+        ).scalar_one()
+        for start in range(0, todos, INSERT_BATCH_SIZE):
+            connection.execute(
+                insert(db_models.Todo),
+                [
+                    {
+                        "title": "benchmark todo",
+                        "description": "benchmark",
+                        "priority": 1,
+                        "completed": False,
+                        "owner_id": user_id,
+                    }
+                    for _ in range(start, min(start + INSERT_BATCH_SIZE, todos))
+                ],
+            )
+    return user_id
+
+
+def _delete_user(bench_engine: Engine, user_id: int, mode: str) -> tuple[float, int]:
+    """Delete the user, returning the seconds taken and the statements sent."""
+    statements = 0
+
+    def count(*args: Any) -> None:
+        nonlocal statements
+        _, _, _, parameters, _, executemany = args
+        # Each row of an executemany is a statement of its own to the database
+        statements += len(parameters) if executemany else 1
+
+    event.listen(bench_engine, "before_cursor_execute", count)
+    start = time.perf_counter()
+    with Session(bench_engine) as db:
+        user = db.get(db_models.User, user_id)
+        if mode == "orm":
+            # A loaded collection is deleted by the session, passive or not
+            db.refresh(user, ["todos"])
+        db.delete(user)
+        db.commit()
+    elapsed = time.perf_counter() - start
+    event.remove(bench_engine, "before_cursor_execute", count)
+
+    with bench_engine.connect() as connection:
+        left = connection.execute(
+            select(func.count()).where(db_models.Todo.owner_id == user_id)
+        ).scalar()
+    if left:
+        raise RuntimeError(f"{left} todos left after deleting their user")
+    return elapsed, statements
+
+
+@cli_app.command()
+def typer_main(
+    todos: Annotated[int, typer.Option(min=1, help="Todos of the user.")] = 100_000,
+    db_url: Annotated[
+        str | None,
+        typer.Option(help="Empty, migrated database to use, instead of SQLite."),
+    ] = None,
+) -> None:
+    """Benchmark deleting a user with ORM and database cascades."""
+    typer.echo(f"{'mode':<10} {'seconds':>8} {'statements':>11}")
+    for mode in ("orm", "database"):
+        with tempfile.TemporaryDirectory() as db_dir:
+            bench_engine = database._create_engine(
+                db_url or f"sqlite:///{Path(db_dir) / 'benchmark.db'}"
+            )
+            if not db_url:
+                db_models.Base.metadata.create_all(bind=bench_engine)
+            user_id = _add_user_with_todos(bench_engine, todos)
+            elapsed, statements = _delete_user(bench_engine, user_id, mode)
+            bench_engine.dispose()
+        typer.echo(f"{mode:<10} {elapsed:>8.2f} {statements:>11}")
+
+
+if __name__ == "__main__":
+    cli_app()
@@ -0,0 +1,86 @@
+"""benchmark_jwt: Compare the JWT backends' throughput.
+
+Prints encode, decode and header (`kid`) parsing operations per second for
+each installed backend and signing algorithm, using throwaway keys.
+Decoding verifies the signature and validates the claims, as on every
+authenticated request.
+
+Run with `python -m scripts.benchmark_jwt --help`
+"""
+import functools
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Annotated, Any
+
+import typer
+
+from app.web import jwt_backends, signing_keys
+
+ALGORITHMS = ("RS256", "ES256")
+
+cli_app = typer.Typer(add_completion=False)
+
+
+def _create_key(algorithm: str) -> signing_keys.SigningKey:
+    with tempfile.TemporaryDirectory() as keys_dir:
+        path = signing_keys.write_key(keys_dir=Path(keys_dir), algorithm=algorithm)
+        return signing_keys.SigningKey.from_pem(kid=path.stem, pem=path.read_bytes())
+
+
+def _ops_per_second(operation: Callable[[], Any], seconds: float) -> float:
+    """Run the operation repeatedly for about `seconds`."""
+    count = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < seconds:
+        operation()
+        count += 1
+    return count / elapsed
+
+
+@cli_app.command()
+def typer_main(
+    seconds: Annotated[
+        float, typer.Option(min=0.1, help="Time to spend on each operation.")
+    ] = 1.0,
+) -> None:
+    """Benchmark encoding and decoding tokens with each JWT backend."""
+    claims = {
+        "sub": "benchmark_user",
+        "user_id": 1,
+        "role": "user",
+        "iat": datetime.now(timezone.utc).timestamp(),
+        "jti": "benchmark-token-id",
+        "exp": datetime.now(timezone.utc) + timedelta(hours=1),
+    }
+    typer.echo(
+        f"{'backend':<8} {'alg':<6} {'encode/s':>10} {'decode/s':>10} {'kid/s':>10}"
+    )
+    for algorithm in ALGORITHMS:
+        key = _create_key(algorithm)
+        for name in jwt_backends.BACKENDS:
+            try:
+                backend = jwt_backends.get_backend(name)
+            except RuntimeError as e:
+                typer.echo(f"{name:<8} skipped: {e}")
+                continue
+            token = backend.encode(claims, key)
+            encode = _ops_per_second(
+                functools.partial(backend.encode, claims, key), seconds
+            )
+            decode = _ops_per_second(
+                functools.partial(backend.decode, token, key), seconds
+            )
+            get_kid = _ops_per_second(
+                functools.partial(backend.get_kid, token), seconds
+            )
+            typer.echo(
+                f"{name:<8} {algorithm:<6} {encode:>10.0f} {decode:>10.0f}"
+                f" {get_kid:>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    cli_app()
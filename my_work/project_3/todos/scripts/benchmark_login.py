@@ -0,0 +1,105 @@
+"""benchmark_login: Compare failed login latency for known and unknown users.
+
+A failed login should cost the same whether or not the username exists, so
+the two latency distributions printed here should match closely.
+
+Run with `python -m scripts.benchmark_login --help`
+"""
+import asyncio
+import statistics
+import time
+from collections.abc import Callable, Coroutine
+from typing import Annotated, Any
+
+import typer
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.datastore import db_models
+from app.permissions import Role
+from app.web import auth, errors
+
+USERNAME = "benchmark_user"
+PASSWORD = "benchmark-password"
+
+cli_app = typer.Typer(add_completion=False)
+
+
+def _create_db() -> Session:
+    """Create an in-memory database with a single user."""
+    engine = create_engine("sqlite://")
+    db_models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(engine)()
+    db.add(
+        db_models.User(
+            email=f"{USERNAME}@example.com",
+            username=USERNAME,
+            first_name="Bench",
+            last_name="Mark",
+            hashed_password=auth.hash_password(PASSWORD),
+            role=Role.USER,
+            is_active=True,
+        )
+    )
+    db.commit()
+    return db
+
+
+async def _time_failed_logins(
+    login: Callable[[], Coroutine[Any, Any, Any]], iterations: int
+) -> list[float]:
+    """Time failed logins, in milliseconds."""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        try:
+            await login()
+        except errors.UserNotAuthenticatedError:
+            pass
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _percentile(timings: list[float], percentile: int) -> float:
+    return statistics.quantiles(timings, n=100)[percentile - 1]
+
+
+def _report(name: str, timings: list[float]) -> None:
+    typer.echo(
+        f"{name:<16} mean {statistics.mean(timings):7.2f}ms"
+        f"  p50 {_percentile(timings, 50):7.2f}ms"
+        f"  p95 {_percentile(timings, 95):7.2f}ms"
+        f"  p99 {_percentile(timings, 99):7.2f}ms"
+    )
+
+
+async def _run(iterations: int) -> None:
+    db = _create_db()
+    # Exclude creating the cached dummy hash from the measurements
+    auth.get_dummy_password_hash()
+
+    known = await _time_failed_logins(
+        lambda: auth.authenticate_user(USERNAME, "wrong-password", db), iterations
+    )
+    unknown = await _time_failed_logins(
+        lambda: auth.authenticate_user("no_such_user", "wrong-password", db),
+        iterations,
+    )
+    _report("known user", known)
+    _report("unknown user", unknown)
+    ratio = statistics.median(unknown) / statistics.median(known)
+    typer.echo(f"median unknown/known ratio: {ratio:.3f}")
+
+
+@cli_app.command()
+def typer_main(
+    iterations: Annotated[
+        int, typer.Option(min=2, help="Failed logins to time per case.")
+    ] = 50,
+) -> None:
+    """Benchmark failed login latency for known and unknown usernames."""
+    asyncio.run(_run(iterations))
+
+
+if __name__ == "__main__":
+    cli_app()
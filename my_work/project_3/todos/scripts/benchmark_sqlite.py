@@ -0,0 +1,135 @@
+"""benchmark_sqlite: Compare SQLite throughput with and without the pragmas.
+
+Runs writer threads inserting todos and reader threads listing a user's
+todos against a throwaway database, first with SQLite's defaults and then
+with `database.SQLITE_PRAGMAS`. Prints the reads and writes per second, and
+the operations that failed with "database is locked".
+
+Run with `python -m scripts.benchmark_sqlite --help`
+"""
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Annotated, Any
+
+import typer
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+from app.datastore import database, db_models
+from app.permissions import Role
+
+USERS = 10
+
+cli_app = typer.Typer(add_completion=False)
+
+
+def _create_db(path: Path, pragmas: dict[str, Any] | None) -> Engine:
+    bench_engine = create_engine(
+        f"sqlite:///{path}", connect_args={"check_same_thread": False}
+    )
+    if pragmas:
+        database.configure_sqlite(bench_engine, pragmas)
+    db_models.Base.metadata.create_all(bind=bench_engine)
+    with bench_engine.begin() as connection:
+        connection.execute(
+            insert(db_models.User),
+            [
+                {
+                    "email": f"user{user_id}@example.com",
+                    "username": f"user{user_id}",
+                    "first_name": "Bench",
+                    "last_name": "Mark",
+                    "hashed_password": "not-a-hash",
+                    "role": Role.USER,
+                    "is_active": True,
+                }
+                for user_id in range(1, USERS + 1)
+            ],
+        )
+    return bench_engine
+
+
+def _run(
+    bench_engine: Engine, readers: int, writers: int, seconds: float
+) -> tuple[int, int, int]:
+    """Run the threads for `seconds`, returning the reads, writes and errors."""
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def count(key: str) -> None:
+        with lock:
+            counts[key] += 1
+
+    def read() -> None:
+        index = 0
+        while not stop.is_set():
+            index += 1
+            owner_id = index % USERS + 1
+            try:
+                with bench_engine.connect() as connection:
+                    connection.execute(
+                        select(db_models.Todo).where(
+                            db_models.Todo.owner_id == owner_id
+                        )
+                    ).all()
+                count("reads")
+            except OperationalError:
+                count("errors")
+
+    def write() -> None:
+        index = 0
+        while not stop.is_set():
+            index += 1
+            try:
+                with bench_engine.begin() as connection:
+                    connection.execute(
+                        insert(db_models.Todo).values(
+                            title="benchmark todo",
+                            description="benchmark",
+                            priority=1,
+                            completed=False,
+                            owner_id=index % USERS + 1,
+                        )
+                    )
+                count("writes")
+            except OperationalError:
+                count("errors")
+
+    threads = [threading.Thread(target=read) for _ in range(readers)]
+    threads += [threading.Thread(target=write) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return counts["reads"], counts["writes"], counts["errors"]
+
+
+@cli_app.command()
+def typer_main(
+    readers: Annotated[int, typer.Option(min=0, help="Reader threads.")] = 4,
+    writers: Annotated[int, typer.Option(min=0, help="Writer threads.")] = 2,
+    seconds: Annotated[
+        float, typer.Option(min=0.1, help="Time to spend on each mode.")
+    ] = 5.0,
+) -> None:
+    """Benchmark concurrent reads and writes with and without the pragmas."""
+    typer.echo(f"{'mode':<8} {'reads/s':>10} {'writes/s':>10} {'errors':>8}")
+    for mode, pragmas in (("default", None), ("tuned", database.SQLITE_PRAGMAS)):
+        with tempfile.TemporaryDirectory() as db_dir:
+            bench_engine = _create_db(Path(db_dir) / "benchmark.db", pragmas)
+            reads, writes, errors = _run(bench_engine, readers, writers, seconds)
+            bench_engine.dispose()
+        typer.echo(
+            f"{mode:<8} {reads / seconds:>10.0f} {writes / seconds:>10.0f}"
+            f" {errors:>8}"
+        )
+
+
+if __name__ == "__main__":
+    cli_app()
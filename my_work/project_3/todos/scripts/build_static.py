@@ -0,0 +1,84 @@
+"""build_static: Fingerprint and precompress the static assets.
+
+Copies every file under `app/web/html/static` into `static/dist` with a
+content hash in its name, writes `.gz` (and `.br`, if `brotli` is
+installed) variants, and records the mapping in `dist/manifest.json`.
+
+Run with `python -m scripts.build_static` after `npm run build`.
+"""
+import gzip
+import hashlib
+import json
+import shutil
+from pathlib import Path
+from typing import Annotated
+
+import typer
+
+from app.web.html.static_assets import DIST_DIR, MANIFEST_PATH, STATIC_DIR
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+HASH_LENGTH = 12
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".svg", ".json", ".txt", ".html"}
+
+cli_app = typer.Typer(add_completion=False)
+
+
+def fingerprint(path: Path) -> str:
+    """Get the fingerprinted name of a file, e.g. `styles.0123456789ab.css`."""
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()[:HASH_LENGTH]
+    return f"{path.stem}.{digest}{path.suffix}"
+
+
+def compress(path: Path) -> None:
+    """Write precompressed variants next to the file."""
+    content = path.read_bytes()
+    path.with_name(path.name + ".gz").write_bytes(
+        gzip.compress(content, compresslevel=9, mtime=0)
+    )
+    if brotli is not None:
+        path.with_name(path.name + ".br").write_bytes(
+            brotli.compress(content, quality=11)
+        )
+
+
+def build(static_dir: Path = STATIC_DIR, dist_dir: Path = DIST_DIR) -> dict[str, str]:
+    """Build the fingerprinted assets and return the manifest."""
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    manifest: dict[str, str] = {}
+    for source in sorted(static_dir.rglob("*")):
+        if not source.is_file() or dist_dir in source.parents:
+            continue
+        relative = source.relative_to(static_dir)
+        target = dist_dir / relative.parent / fingerprint(source)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(source, target)
+        if source.suffix in COMPRESSIBLE_SUFFIXES:
+            compress(target)
+        manifest[relative.as_posix()] = target.relative_to(static_dir).as_posix()
+    (dist_dir / MANIFEST_PATH.name).write_text(
+        json.dumps(manifest, indent=2, sort_keys=True)
+    )
+    return manifest
+
+
+@cli_app.command()
+def typer_main(
+    clean: Annotated[bool, typer.Option(help="Only remove the built assets.")] = False,
+) -> None:
+    """Fingerprint and precompress the static assets."""
+    if clean:
+        shutil.rmtree(DIST_DIR, ignore_errors=True)
+        return
+    if brotli is None:
+        typer.echo("brotli not installed, skipping .br variants.")
+    for source, target in build().items():
+        typer.echo(f"{source} -> {target}")
+
+
+if __name__ == "__main__":
+    cli_app()
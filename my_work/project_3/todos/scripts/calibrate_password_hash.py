@@ -0,0 +1,86 @@
+"""calibrate_password_hash: Pick a password hash cost for this host.
+
+Times hashing at increasing costs and suggests the highest cost whose hash
+stays within the target latency. Run it on the production hardware and set
+the printed environment variables there.
+
+Run with `python -m scripts.calibrate_password_hash --help`
+"""
+import statistics
+import time
+from enum import Enum
+from typing import Annotated
+
+import typer
+from passlib.context import CryptContext
+
+from app.web import auth
+
+PASSWORD = "calibration-password"
+MIN_BCRYPT_ROUNDS = 10
+MAX_BCRYPT_ROUNDS = 16
+MIN_ARGON2_TIME_COST = 1
+MAX_ARGON2_TIME_COST = 10
+
+cli_app = typer.Typer(add_completion=False)
+
+
+class Scheme(str, Enum):
+    BCRYPT = "bcrypt"
+    ARGON2 = "argon2"
+
+
+def time_hash(context: CryptContext, iterations: int) -> float:
+    """Get the median time to hash a password, in milliseconds."""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        context.hash(PASSWORD)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def _create_context(scheme: Scheme, cost: int) -> CryptContext:
+    if scheme == Scheme.BCRYPT:
+        return auth.create_password_context(schemes=["bcrypt"], bcrypt_rounds=cost)
+    return auth.create_password_context(schemes=["argon2"], argon2_time_cost=cost)
+
+
+@cli_app.command()
+def typer_main(
+    scheme: Annotated[Scheme, typer.Option(help="Hash scheme to calibrate.")] = (
+        Scheme.BCRYPT
+    ),
+    target_ms: Annotated[
+        float, typer.Option(min=1, help="Highest acceptable hash time.")
+    ] = 250,
+    iterations: Annotated[
+        int, typer.Option(min=1, help="Hashes to time per cost.")
+    ] = 3,
+) -> None:
+    """Time password hashing per cost and suggest the cost to configure."""
+    if scheme == Scheme.BCRYPT:
+        costs = range(MIN_BCRYPT_ROUNDS, MAX_BCRYPT_ROUNDS + 1)
+        variable = "BCRYPT_ROUNDS"
+        schemes = "bcrypt"
+    else:
+        costs = range(MIN_ARGON2_TIME_COST, MAX_ARGON2_TIME_COST + 1)
+        variable = "ARGON2_TIME_COST"
+        # Keep bcrypt so existing hashes still verify and get rehashed
+        schemes = "argon2,bcrypt"
+    chosen = None
+    for cost in costs:
+        median_ms = time_hash(_create_context(scheme, cost), iterations)
+        typer.echo(f"{variable}={cost:<3} {median_ms:8.1f}ms")
+        if median_ms > target_ms:
+            # Cost grows monotonically, so higher costs are slower still
+            break
+        chosen = cost
+    if chosen is None:
+        typer.echo(f"Even the lowest cost is slower than {target_ms}ms.")
+        raise typer.Exit(code=1)
+    typer.echo(f"\nSuggested: PASSWORD_SCHEMES={schemes} {variable}={chosen}")
+
+
+if __name__ == "__main__":
+    cli_app()
@@ -0,0 +1,93 @@
+"""profile_imports: Report the slowest imports of the app.
+
+Imports the module in a fresh interpreter with `python -X importtime`, and
+prints its imports sorted by cumulative (or self) time. With `--budget-ms`,
+exits with an error when the module takes longer than the budget to
+import, e.g. to catch an eager import of a heavy dependency in CI.
+
+Run with `python -m scripts.profile_imports --help`
+"""
+import subprocess
+import sys
+from enum import Enum
+from typing import Annotated, NamedTuple
+
+import typer
+
+DEFAULT_MODULE = "app.web.main"
+
+cli_app = typer.Typer(add_completion=False)
+
+
+class SortKey(str, Enum):
+    CUMULATIVE = "cumulative"
+    SELF = "self"
+
+
+class ImportTime(NamedTuple):
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def profile_imports(module: str) -> list[ImportTime]:
+    """Import the module in a new interpreter, timing each import."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode:
+        raise RuntimeError(f"Failed to import {module}:\n{process.stderr}")
+    import_times = []
+    for line in process.stderr.splitlines():
+        # e.g. "import time:       983 |     906333 |   app.web.main"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        import_times.append(
+            ImportTime(
+                module=name.strip(),
+                depth=(len(name) - len(name.lstrip())) // 2,
+                self_us=int(self_us),
+                cumulative_us=int(cumulative_us),
+            )
+        )
+    return import_times
+
+
+@cli_app.command()
+def typer_main(
+    module: Annotated[str, typer.Argument(help="Module to import.")] = DEFAULT_MODULE,
+    sort: Annotated[
+        SortKey, typer.Option(help="Time to sort the imports by.")
+    ] = SortKey.CUMULATIVE,
+    top: Annotated[int, typer.Option(min=1, help="Imports to show.")] = 30,
+    budget_ms: Annotated[
+        float | None, typer.Option(help="Fail if the module imports slower.")
+    ] = None,
+) -> None:
+    """Profile importing the module."""
+    import_times = profile_imports(module)
+    total = next(
+        import_time for import_time in import_times if import_time.module == module
+    )
+    sort_field = "self_us" if sort == SortKey.SELF else "cumulative_us"
+    import_times.sort(key=lambda import_time: getattr(import_time, sort_field))
+    typer.echo(f"{'self ms':>8} {'cum ms':>8}  module")
+    for import_time in reversed(import_times[-top:]):
+        typer.echo(
+            f"{import_time.self_us / 1000:>8.1f}"
+            f" {import_time.cumulative_us / 1000:>8.1f}"
+            f"  {'  ' * import_time.depth}{import_time.module}"
+        )
+    total_ms = total.cumulative_us / 1000
+    typer.echo(f"\n{module} imported in {total_ms:.0f}ms")
+    if budget_ms is not None and total_ms > budget_ms:
+        typer.echo(f"Over the {budget_ms:.0f}ms budget", err=True)
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    cli_app()
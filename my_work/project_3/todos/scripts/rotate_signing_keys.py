@@ -0,0 +1,59 @@
+"""rotate_signing_keys: Add a new access token signing key.
+
+New tokens are signed with the new key once each process reloads its key
+set. Older keys keep verifying the tokens they signed; `--prune` removes
+those superseded long enough ago that all of their tokens have expired.
+
+Run with `python -m scripts.rotate_signing_keys --help`
+"""
+import time
+from pathlib import Path
+from typing import Annotated
+
+import typer
+
+from app.web import auth, signing_keys
+
+cli_app = typer.Typer(add_completion=False)
+
+
+def prune_keys(keys_dir: Path) -> list[Path]:
+    """Remove keys whose tokens have all expired, returning their paths.
+
+    A key stops signing once every process has loaded its successor, and
+    its tokens expire a token lifetime after that.
+    """
+    retention = (
+        signing_keys.KEY_SET_REFRESH_SECONDS + auth.TOKEN_EXPIRATION.total_seconds()
+    )
+    paths = sorted(keys_dir.glob("*.pem"))
+    removed = []
+    for path, successor in zip(paths, paths[1:]):
+        if time.time() - successor.stat().st_mtime > retention:
+            path.unlink()
+            removed.append(path)
+    return removed
+
+
+@cli_app.command()
+def typer_main(
+    algorithm: Annotated[
+        str, typer.Option(help="Algorithm for the new key, RS256 or ES256.")
+    ] = signing_keys.ALGORITHM,
+    prune: Annotated[
+        bool, typer.Option(help="Also remove keys whose tokens have expired.")
+    ] = False,
+    keys_dir: Annotated[
+        Path, typer.Option(help="Directory of signing keys.")
+    ] = signing_keys.KEYS_DIR,
+) -> None:
+    """Add a new signing key, optionally pruning expired ones."""
+    path = signing_keys.write_key(keys_dir=keys_dir, algorithm=algorithm)
+    typer.echo(f"Added {path}")
+    if prune:
+        for removed in prune_keys(keys_dir):
+            typer.echo(f"Removed {removed}")
+
+
+if __name__ == "__main__":
+    cli_app()
@@ -0,0 +1,111 @@
+"""Fixtures running the app against a throwaway SQLite database."""
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.datastore import database, db_models
+from app.permissions import Role
+from app.web import auth, rate_limit, revocation, signing_keys
+from app.web.html.routes import auth as html_auth
+from app.web.main import app
+
+
+@pytest.fixture(autouse=True, scope="session")
+def key_set(tmp_path_factory: pytest.TempPathFactory) -> signing_keys.KeySet:
+    """Sign tokens with a key generated for the test run."""
+    test_key_set = signing_keys.KeySet(tmp_path_factory.mktemp("keys"))
+    signing_keys.key_set = test_key_set
+    return test_key_set
+
+
+@pytest.fixture(autouse=True)
+def revocation_store(monkeypatch: pytest.MonkeyPatch) -> revocation.RevocationStore:
+    """Start each test with no revoked tokens."""
+    store = revocation.BloomFilteredRevocationStore(
+        revocation.InMemoryRevocationStore()
+    )
+    monkeypatch.setattr(revocation, "store", store)
+    return store
+
+
+@pytest.fixture(autouse=True)
+def rate_limit_backend(
+    monkeypatch: pytest.MonkeyPatch,
+) -> rate_limit.InMemoryRateLimitBackend:
+    """Start each test with full login buckets."""
+    backend = rate_limit.InMemoryRateLimitBackend()
+    monkeypatch.setattr(rate_limit, "backend", backend)
+    return backend
+
+
+@pytest.fixture
+def engine(tmp_path: Path) -> Iterator[Engine]:
+    test_engine = database._create_engine(f"sqlite:///{tmp_path / 'todos_db.db'}")
+    db_models.Base.metadata.create_all(bind=test_engine)
+    yield test_engine
+    test_engine.dispose()
+
+
+@pytest.fixture
+def session_maker(
+    engine: Engine, monkeypatch: pytest.MonkeyPatch
+) -> sessionmaker[Session]:
+    """Sessions of the test database, also opened by the app's own sessions."""
+    test_session_maker = sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(database, "SessionLocal", test_session_maker)
+    return test_session_maker
+
+
+@pytest.fixture
+def client(session_maker: sessionmaker[Session]) -> TestClient:
+    """Client whose requests use the test database.
+
+    The app's lifespan isn't run, so it doesn't touch the app's database.
+    """
+    return TestClient(app)
+
+
+@pytest.fixture
+def make_user(session_maker: sessionmaker[Session]) -> Callable[..., db_models.User]:
+    def make(username: str = "alice", role: Role = Role.USER) -> db_models.User:
+        with session_maker() as session:
+            user = db_models.User(
+                email=f"{username}@example.com",
+                username=username,
+                first_name="Test",
+                last_name="User",
+                hashed_password="not-a-hash",
+                role=role,
+                is_active=True,
+            )
+            session.add(user)
+            session.commit()
+            return user
+
+    return make
+
+
+@pytest.fixture
+def logged_in_client(
+    client: TestClient, make_user: Callable[..., db_models.User]
+) -> TestClient:
+    """Client with the access token cookie of a new user, "alice"."""
+    user = make_user()
+    token = auth.create_access_token(user=user, session_id="test-session")
+    client.cookies.set(html_auth.ACCESS_TOKEN, token.access_token)
+    return client
+
+
+@pytest.fixture
+def bearer_headers() -> Callable[[db_models.User], dict[str, str]]:
+    """Get the Authorization header of a new session of the user."""
+
+    def bearer_headers(user: db_models.User) -> dict[str, str]:
+        token = auth.create_access_token(user=user, session_id=f"session-{user.id}")
+        return {"Authorization": f"Bearer {token.access_token}"}
+
+    return bearer_headers
@@ -0,0 +1,98 @@
+"""API keys, authenticating machine clients to the API."""
+from collections.abc import Callable, Iterator
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.datastore import db_models
+from app.web import api_keys, errors
+
+
+@pytest.fixture(autouse=True)
+def empty_cache() -> Iterator[None]:
+    api_keys._cache.clear()
+    yield
+    api_keys._cache.clear()
+
+
+@pytest.fixture
+def headers(
+    make_user: Callable[..., db_models.User],
+    bearer_headers: Callable[[db_models.User], dict[str, str]],
+) -> dict[str, str]:
+    return bearer_headers(make_user())
+
+
+def _create_key(client: TestClient, headers: dict[str, str]) -> dict[str, Any]:
+    response = client.post("/api/api-keys", json={"name": "deploy"}, headers=headers)
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_created_key_authenticates(client: TestClient, headers: dict[str, str]) -> None:
+    created = _create_key(client, headers)
+
+    assert created["key"].startswith(f"{api_keys.KEY_NAMESPACE}_{created['prefix']}_")
+    response = client.get("/api/todos", headers={"X-API-Key": created["key"]})
+    assert response.status_code == 200
+    listed = client.get("/api/api-keys", headers=headers).json()
+    assert [key["prefix"] for key in listed] == [created["prefix"]]
+    assert "key" not in listed[0]
+
+
+def test_key_looked_up_by_prefix_then_cached(
+    client: TestClient,
+    headers: dict[str, str],
+    engine: Engine,
+    session_maker: sessionmaker[Session],
+) -> None:
+    key = _create_key(client, headers)["key"]
+    statements: list[str] = []
+
+    def record(*args: Any) -> None:
+        statements.append(args[2])
+
+    event.listen(engine, "before_cursor_execute", record)
+    with session_maker() as db:
+        first = api_keys.authenticate_api_key(db, key)
+        api_key_statements = [
+            statement for statement in statements if "FROM api_keys" in statement
+        ]
+        statements.clear()
+        second = api_keys.authenticate_api_key(db, key)
+    event.remove(engine, "before_cursor_execute", record)
+
+    assert len(api_key_statements) == 1
+    assert "WHERE api_keys.prefix = ?" in api_key_statements[0]
+    assert second == first
+    assert statements == []
+
+
+def test_key_with_wrong_secret_rejected(
+    client: TestClient, headers: dict[str, str]
+) -> None:
+    created = _create_key(client, headers)
+    wrong_key = f"{api_keys.KEY_NAMESPACE}_{created['prefix']}_not-the-secret"
+
+    response = client.get("/api/todos", headers={"X-API-Key": wrong_key})
+
+    assert response.status_code == 401
+    assert response.json()["detail"] == errors.UserNotValidatedError.detail
+
+
+def test_revoked_key_rejected_despite_cache(
+    client: TestClient, headers: dict[str, str]
+) -> None:
+    created = _create_key(client, headers)
+    key_headers = {"X-API-Key": created["key"]}
+    assert client.get("/api/todos", headers=key_headers).status_code == 200
+
+    response = client.delete(f"/api/api-keys/{created['id']}", headers=headers)
+
+    assert response.status_code == 204
+    assert client.get("/api/todos", headers=key_headers).status_code == 401
+    assert client.get("/api/api-keys", headers=headers).json() == []
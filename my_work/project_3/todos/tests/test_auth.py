@@ -0,0 +1,103 @@
+"""Logging in, and authorizing with the token claims."""
+import asyncio
+import time
+from collections.abc import Callable, Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.datastore import db_models
+from app.permissions import Role
+from app.web import auth, revocation
+
+PASSWORD = "correct horse battery staple"
+
+
+def test_login_rehashes_outdated_hash(
+    client: TestClient,
+    session_maker: sessionmaker[Session],
+    make_user: Callable[..., db_models.User],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Cheap rounds, keeping the test fast
+    context = auth.create_password_context(bcrypt_rounds=5)
+    monkeypatch.setattr(auth, "get_password_context", lambda: context)
+    user = make_user()
+    outdated_hash = auth.create_password_context(bcrypt_rounds=4).hash(PASSWORD)
+    with session_maker() as db:
+        db.get(db_models.User, user.id).hashed_password = outdated_hash
+        db.commit()
+
+    response = client.post(
+        "/api/auth/token", data={"username": "alice", "password": PASSWORD}
+    )
+
+    assert response.status_code == 200
+    with session_maker() as db:
+        new_hash = db.get(db_models.User, user.id).hashed_password
+    assert new_hash != outdated_hash
+    assert not context.needs_update(new_hash)
+    assert context.verify(PASSWORD, new_hash)
+
+
+@pytest.fixture
+def user_queries(engine: Engine) -> Iterator[list[str]]:
+    """Statements reading the users table."""
+    statements: list[str] = []
+
+    def record(conn, cursor, statement: str, *args) -> None:
+        if "FROM users" in statement:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def test_claims_user_only_reaches_own_todos(
+    client: TestClient,
+    make_user: Callable[..., db_models.User],
+    bearer_headers: Callable[[db_models.User], dict[str, str]],
+) -> None:
+    alice = bearer_headers(make_user("alice"))
+    bob = bearer_headers(make_user("bob"))
+    admin = bearer_headers(make_user("admin", role=Role.ADMIN))
+    todo = {"title": "Bob's", "description": "Private", "priority": 1}
+    response = client.post("/api/todos", json=todo | {"completed": False}, headers=bob)
+    todo_id = response.json()["id"]
+    url = f"/api/todos/{todo_id}"
+
+    assert client.get(url, headers=bob).status_code == 200
+    assert client.get(url, headers=admin).status_code == 200
+    assert client.get(url, headers=alice).status_code == 404
+    assert client.patch(url, json={"completed": True}, headers=alice).status_code == 404
+    assert client.delete(url, headers=alice).status_code == 404
+    assert client.get("/api/todos", headers=alice).json() == []
+    assert client.get(url, headers=bob).json()["completed"] is False
+
+
+def test_claims_user_revoked_without_loading_user(
+    client: TestClient,
+    make_user: Callable[..., db_models.User],
+    bearer_headers: Callable[[db_models.User], dict[str, str]],
+    revocation_store: revocation.RevocationStore,
+    user_queries: list[str],
+) -> None:
+    alice_user, bob_user = make_user("alice"), make_user("bob")
+    alice, bob = bearer_headers(alice_user), bearer_headers(bob_user)
+    assert client.get("/api/todos", headers=alice).status_code == 200
+    assert client.get("/api/todos", headers=bob).status_code == 200
+
+    asyncio.run(
+        revocation_store.revoke_token(
+            f"session-{alice_user.id}", expires_at=time.time() + 60
+        )
+    )
+    asyncio.run(revocation_store.revoke_user(bob_user.id, ttl=60))
+
+    assert client.get("/api/todos", headers=alice).status_code == 401
+    assert client.get("/api/todos", headers=bob).status_code == 401
+    assert user_queries == []
@@ -0,0 +1,134 @@
+"""Engines and sessions of the app's databases."""
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.datastore import database, db_models
+from app.services import todos
+
+
+def test_sqlite_untuned_by_default(tmp_path: Path) -> None:
+    sqlite_engine = database._create_engine(f"sqlite:///{tmp_path / 'default.db'}")
+    with sqlite_engine.connect() as connection:
+        journal_mode = connection.execute(text("PRAGMA journal_mode")).scalar()
+        foreign_keys = connection.execute(text("PRAGMA foreign_keys")).scalar()
+    sqlite_engine.dispose()
+
+    assert not database.SQLITE_TUNED
+    assert journal_mode == "delete"
+    assert foreign_keys == 1
+
+
+def test_sqlite_pragmas_applied(tmp_path: Path) -> None:
+    sqlite_engine = create_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    database.configure_sqlite(sqlite_engine, database.SQLITE_PRAGMAS)
+    with sqlite_engine.connect() as connection:
+        journal_mode = connection.execute(text("PRAGMA journal_mode")).scalar()
+        busy_timeout = connection.execute(text("PRAGMA busy_timeout")).scalar()
+    sqlite_engine.dispose()
+
+    assert journal_mode == "wal"
+    assert busy_timeout == database.SQLITE_PRAGMAS["busy_timeout"]
+
+
+@pytest.mark.parametrize(
+    "pragmas",
+    [
+        {"journal_mode": "WAL; DROP TABLE users"},
+        {"busy_timeout": "5000; DROP TABLE users"},
+        {"key": "secret"},
+    ],
+)
+def test_sqlite_pragmas_validated(pragmas: dict[str, str]) -> None:
+    with pytest.raises(ValueError):
+        database.configure_sqlite(create_engine("sqlite://"), pragmas)
+
+
+@pytest.fixture
+def replica_engine(
+    tmp_path: Path, engine: Engine, client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[Engine]:
+    """Route the sessions of the test database to a replica of their own.
+
+    The replica isn't replicated to, so the rows read show where from.
+    """
+    test_replica_engine = database._create_engine(
+        f"sqlite:///{tmp_path / 'replica.db'}"
+    )
+    db_models.Base.metadata.create_all(bind=test_replica_engine)
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "replica_engines", [test_replica_engine])
+    monkeypatch.setattr(
+        database,
+        "SessionLocal",
+        sessionmaker(engine, class_=database.RoutingSession, expire_on_commit=False),
+    )
+    yield test_replica_engine
+    test_replica_engine.dispose()
+
+
+def _add_user_with_todos(
+    session_maker: sessionmaker[Session], user: db_models.User, titles: list[str]
+) -> None:
+    with session_maker() as db:
+        db.merge(user)
+        db.add_all(todos.new_todo(user, title) for title in titles)
+        db.commit()
+
+
+def test_session_reads_replica_until_it_writes(
+    replica_engine: Engine,
+    session_maker: sessionmaker[Session],
+    make_user: Callable[..., db_models.User],
+) -> None:
+    user = make_user()
+    _add_user_with_todos(sessionmaker(replica_engine), user, ["replica todo"])
+
+    with database.session_scope(use_replica=True) as db:
+        before_write = [todo.title for todo in db.query(db_models.Todo)]
+        db.add(todos.new_todo(user, "primary todo"))
+        db.flush()
+        after_write = [todo.title for todo in db.query(db_models.Todo)]
+
+    assert before_write == ["replica todo"]
+    # Reads its own write from the primary
+    assert after_write == ["primary todo"]
+
+
+def _get_user(session_maker: sessionmaker[Session], username: str) -> db_models.User:
+    with session_maker() as db:
+        return db.query(db_models.User).filter_by(username=username).one()
+
+
+def test_get_request_reads_replica(
+    replica_engine: Engine,
+    session_maker: sessionmaker[Session],
+    logged_in_client: TestClient,
+) -> None:
+    alice = _get_user(session_maker, "alice")
+    _add_user_with_todos(sessionmaker(replica_engine), alice, ["replica todo"])
+
+    response = logged_in_client.get("/todos")
+
+    assert "replica todo" in response.text
+
+
+def test_post_request_reads_its_writes(
+    replica_engine: Engine,
+    session_maker: sessionmaker[Session],
+    logged_in_client: TestClient,
+) -> None:
+    alice = _get_user(session_maker, "alice")
+    _add_user_with_todos(
+        sessionmaker(replica_engine), alice, ["replica todo", "another todo"]
+    )
+
+    response = logged_in_client.post("/todos", data={"title": "primary todo"})
+
+    # Counted on the primary, which only has the new todo
+    assert "1 of 1 remaining" in " ".join(response.text.split())
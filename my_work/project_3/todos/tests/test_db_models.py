@@ -0,0 +1,38 @@
+"""Relationships of the database models."""
+from collections.abc import Callable
+from typing import Any
+
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.datastore import db_models
+from app.services import todos
+
+
+def test_deleting_user_cascades_in_database(
+    engine: Engine,
+    session_maker: sessionmaker[Session],
+    make_user: Callable[..., db_models.User],
+) -> None:
+    user = make_user()
+    with session_maker() as db:
+        db.add_all(todos.new_todo(user, f"todo {index}") for index in range(3))
+        db.commit()
+
+    statements: list[str] = []
+
+    def record(*args: Any) -> None:
+        statements.append(args[2])
+
+    event.listen(engine, "before_cursor_execute", record)
+    with session_maker() as db:
+        db.delete(db.get(db_models.User, user.id))
+        db.commit()
+    event.remove(engine, "before_cursor_execute", record)
+
+    # The todos are neither loaded nor deleted by the session
+    assert not any("todos" in statement for statement in statements)
+    with engine.connect() as connection:
+        left = connection.scalar(select(func.count()).select_from(db_models.Todo))
+    assert left == 0
@@ -0,0 +1,91 @@
+"""Group commit of queued writes."""
+import asyncio
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.datastore import db_models, group_commit
+from app.services import todos
+from app.web import errors
+
+
+def _run_writes(
+    session_maker: sessionmaker[Session], writes: list[Callable[[Session], Any]]
+) -> list[Any]:
+    """Submit the writes at once, returning each one's result or error."""
+    writer = group_commit.GroupCommitWriter(session_maker, window=0.01)
+
+    async def submit_all() -> list[Any]:
+        try:
+            return await asyncio.gather(
+                *(writer.submit(write) for write in writes), return_exceptions=True
+            )
+        finally:
+            await writer.close()
+
+    return asyncio.run(submit_all())
+
+
+@pytest.fixture
+def user(make_user: Callable[..., db_models.User]) -> db_models.User:
+    return make_user()
+
+
+def _add_todo(user: db_models.User, title: str) -> Callable[[Session], int]:
+    def add(session: Session) -> int:
+        todo = todos.new_todo(user, title)
+        session.add(todo)
+        session.flush()
+        return todo.id
+
+    return add
+
+
+def _titles(session_maker: sessionmaker[Session]) -> list[str]:
+    with session_maker() as db:
+        return sorted(todo.title for todo in db.query(db_models.Todo))
+
+
+def test_batch_committed(
+    session_maker: sessionmaker[Session], user: db_models.User
+) -> None:
+    results = _run_writes(
+        session_maker, [_add_todo(user, f"todo {index}") for index in range(3)]
+    )
+
+    assert sorted(results) == [1, 2, 3]
+    assert _titles(session_maker) == ["todo 0", "todo 1", "todo 2"]
+
+
+def test_failed_write_only_fails_itself(
+    session_maker: sessionmaker[Session], user: db_models.User
+) -> None:
+    def update_missing(session: Session) -> None:
+        todos.get_todo_for_write(session, todo_id=404).title = "missing"
+
+    results = _run_writes(
+        session_maker,
+        [_add_todo(user, "first"), update_missing, _add_todo(user, "second")],
+    )
+
+    assert isinstance(results[1], errors.TodoNotFoundError)
+    assert _titles(session_maker) == ["first", "second"]
+
+
+def test_bug_fails_batch_without_retrying(
+    session_maker: sessionmaker[Session], user: db_models.User
+) -> None:
+    calls = 0
+
+    def buggy(session: Session) -> None:
+        nonlocal calls
+        calls += 1
+        raise TypeError("bug")
+
+    results = _run_writes(session_maker, [_add_todo(user, "first"), buggy])
+
+    assert all(isinstance(result, TypeError) for result in results)
+    assert calls == 1
+    assert _titles(session_maker) == []
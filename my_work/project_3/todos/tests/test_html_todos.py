@@ -0,0 +1,222 @@
+"""The htmx fragments returned by the html todo routes, and their websocket."""
+import asyncio
+import time
+from collections.abc import Callable
+from html.parser import HTMLParser
+from typing import NamedTuple
+
+import pytest
+from fastapi import Request, WebSocketDisconnect, status
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.datastore import db_models
+from app.web import auth, revocation
+from app.web.html.routes import todos as html_todos
+
+VOID_ELEMENTS = {"input", "br", "img", "hr", "meta", "link"}
+
+
+class Element(NamedTuple):
+    tag: str
+    attrs: dict[str, str | None]
+    text: str
+
+    @property
+    def is_oob(self) -> bool:
+        return self.attrs.get("hx-swap-oob") == "true"
+
+    @property
+    def classes(self) -> list[str]:
+        return (self.attrs.get("class") or "").split()
+
+
+class _TopLevelParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.elements: list[Element] = []
+        self.depth = 0
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if self.depth == 0:
+            self.elements.append(Element(tag, dict(attrs), ""))
+        if tag not in VOID_ELEMENTS:
+            self.depth += 1
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if self.depth == 0:
+            self.elements.append(Element(tag, dict(attrs), ""))
+
+    def handle_endtag(self, tag: str) -> None:
+        self.depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        if self.elements and self.depth > 0:
+            element = self.elements[-1]
+            self.elements[-1] = element._replace(text=element.text + data)
+
+
+def parse_elements(html: str) -> dict[str, Element]:
+    """Get the top level elements of a response by id."""
+    parser = _TopLevelParser()
+    parser.feed(html)
+    return {element.attrs["id"] or "": element for element in parser.elements}
+
+
+def _text(element: Element) -> str:
+    return " ".join(element.text.split())
+
+
+def test_add_first_todo(logged_in_client: TestClient) -> None:
+    response = logged_in_client.post("/todos", data={"title": "first todo"})
+    assert response.status_code == 200
+    elements = parse_elements(response.text)
+
+    assert set(elements) == {"todo-1", "todo-count", "todos-empty"}
+    assert not elements["todo-1"].is_oob
+    assert elements["todo-count"].is_oob
+    assert _text(elements["todo-count"]) == "1 of 1 remaining"
+    assert elements["todos-empty"].is_oob
+    assert "hidden" in elements["todos-empty"].classes
+    assert "flash-messages" not in elements
+
+
+def test_add_later_todo_leaves_empty_state(logged_in_client: TestClient) -> None:
+    logged_in_client.post("/todos", data={"title": "first todo"})
+    response = logged_in_client.post("/todos", data={"title": "second todo"})
+    elements = parse_elements(response.text)
+
+    assert _text(elements["todo-count"]) == "2 of 2 remaining"
+    assert "todos-empty" not in elements
+
+
+def test_add_invalid_todo(logged_in_client: TestClient) -> None:
+    response = logged_in_client.post("/todos", data={"title": "ab"})
+    assert response.status_code == 400
+    assert response.text == ""
+
+
+def test_complete_todo_updates_count(logged_in_client: TestClient) -> None:
+    logged_in_client.post("/todos", data={"title": "first todo"})
+    response = logged_in_client.patch(
+        "/todos/1", data={"title": "first todo", "completed": "y"}
+    )
+    elements = parse_elements(response.text)
+
+    assert not elements["todo-1"].is_oob
+    assert "line-through" in elements["todo-1"].classes
+    assert elements["todo-count"].is_oob
+    assert _text(elements["todo-count"]) == "0 of 1 remaining"
+
+
+def test_rename_todo_leaves_count(logged_in_client: TestClient) -> None:
+    logged_in_client.post("/todos", data={"title": "first todo"})
+    response = logged_in_client.patch("/todos/1", data={"title": "renamed"})
+    elements = parse_elements(response.text)
+
+    assert list(elements) == ["todo-1"]
+    assert 'value="renamed"' in response.text
+
+
+def test_delete_last_todo(logged_in_client: TestClient) -> None:
+    logged_in_client.post("/todos", data={"title": "first todo"})
+    response = logged_in_client.delete("/todos/1")
+    assert response.status_code == 200
+    elements = parse_elements(response.text)
+
+    # The todo itself is removed client side
+    assert set(elements) == {"todo-count", "flash-messages", "todos-empty"}
+    assert all(element.is_oob for element in elements.values())
+    assert _text(elements["todo-count"]) == "0 of 0 remaining"
+    assert "Deleted todo 'first todo'." in _text(elements["flash-messages"])
+    assert "hidden" not in elements["todos-empty"].classes
+
+
+def test_delete_todo_with_others_left(logged_in_client: TestClient) -> None:
+    logged_in_client.post("/todos", data={"title": "first todo"})
+    logged_in_client.post("/todos", data={"title": "second todo"})
+    response = logged_in_client.delete("/todos/1")
+    elements = parse_elements(response.text)
+
+    assert set(elements) == {"todo-count", "flash-messages"}
+    assert _text(elements["todo-count"]) == "1 of 1 remaining"
+
+
+def test_update_other_users_todo(
+    logged_in_client: TestClient,
+    make_user: Callable[..., db_models.User],
+    session_maker: sessionmaker[Session],
+) -> None:
+    bob = make_user("bob")
+    with session_maker() as session:
+        session.add(
+            db_models.Todo(
+                title="bobs todo", description="desc", priority=1, owner_id=bob.id
+            )
+        )
+        session.commit()
+    response = logged_in_client.patch(
+        "/todos/1", data={"title": "hacked"}, follow_redirects=False
+    )
+
+    # Web errors redirect to the error page
+    assert response.status_code == 307
+    assert "status_code=403" in response.headers["location"]
+    with session_maker() as session:
+        assert session.get(db_models.Todo, 1).title == "bobs todo"
+
+
+def test_socket_applies_batch(logged_in_client: TestClient) -> None:
+    with logged_in_client.websocket_connect("/todos/ws") as websocket:
+        websocket.send_json(
+            {"mutations": [{"id": "m1", "op": "create", "title": "first todo"}]}
+        )
+        reply = websocket.receive_json()
+
+    assert [ack["status_code"] for ack in reply["acks"]] == [200]
+    assert 'id="todo-1"' in reply["acks"][0]["html"]
+
+
+def test_socket_closes_once_token_revoked(
+    logged_in_client: TestClient, revocation_store: revocation.RevocationStore
+) -> None:
+    with logged_in_client.websocket_connect("/todos/ws") as websocket:
+        asyncio.run(
+            revocation_store.revoke_token("test-session", expires_at=time.time() + 60)
+        )
+        websocket.send_json(
+            {"mutations": [{"id": "m1", "op": "create", "title": "first todo"}]}
+        )
+        with pytest.raises(WebSocketDisconnect) as disconnect:
+            websocket.receive_json()
+
+    assert disconnect.value.code == status.WS_1008_POLICY_VIOLATION
+
+
+def test_event_stream_ends_once_token_revoked(
+    make_user: Callable[..., db_models.User],
+    revocation_store: revocation.RevocationStore,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(html_todos, "EVENTS_KEEPALIVE_SECONDS", 0.01)
+    token = auth.create_access_token(user=make_user(), session_id="test-session")
+
+    async def read_stream() -> list[str]:
+        payload = await auth.parse_access_token(access_token=token.access_token)
+        stream = html_todos._stream_todo_events(Request({"type": "http"}), payload)
+        first_chunk = await anext(stream)
+        await revocation_store.revoke_token("test-session", expires_at=time.time() + 60)
+        return [first_chunk, *[chunk async for chunk in stream]]
+
+    assert asyncio.run(read_stream()) == [": keep-alive\n\n"]
+
+
+def test_event_stream_ends_once_token_expires(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(html_todos, "EVENTS_KEEPALIVE_SECONDS", 0.01)
+    payload = {"user_id": 1, "exp": time.time() - 1}
+
+    async def read_stream() -> list[str]:
+        stream = html_todos._stream_todo_events(Request({"type": "http"}), payload)
+        return [chunk async for chunk in stream]
+
+    assert asyncio.run(read_stream()) == []
@@ -0,0 +1,28 @@
+"""Importing the app stays fast, deferring its heavy dependencies."""
+from pathlib import Path
+
+import pytest
+
+from scripts.profile_imports import profile_imports
+
+# Generous, so slow CI machines don't fail, but an eager import of a heavy
+# dependency still shows
+IMPORT_BUDGET_MS = 2000
+DEFERRED_PACKAGES = {"jose", "passlib", "cryptography"}
+
+
+def test_app_import_time(monkeypatch: pytest.MonkeyPatch) -> None:
+    # The new interpreter imports the app from its working directory
+    monkeypatch.chdir(Path(__file__).parents[1])
+    import_times = profile_imports("app.web.main")
+
+    total = next(
+        import_time
+        for import_time in import_times
+        if import_time.module == "app.web.main"
+    )
+    assert total.cumulative_us / 1000 < IMPORT_BUDGET_MS
+    imported_packages = {
+        import_time.module.partition(".")[0] for import_time in import_times
+    }
+    assert not imported_packages & DEFERRED_PACKAGES
@@ -0,0 +1,26 @@
+"""Estimating the locks of a migration."""
+from sqlalchemy.engine import Engine
+
+from app.datastore import online_migrations
+
+
+def test_plan_locks_with_row_counts(engine: Engine) -> None:
+    sql = """
+-- Running upgrade 8025001941a0 -> 530aba752f1f
+
+CREATE INDEX CONCURRENTLY ix_todos_owner_id_id ON todos (owner_id, id);
+
+CREATE TABLE new_table (id INTEGER NOT NULL);
+
+ALTER TABLE new_table ADD COLUMN name VARCHAR;
+"""
+    with engine.connect() as connection:
+        impacts = online_migrations.plan_locks(sql, connection)
+
+    assert [(impact.table, impact.lock, impact.rows) for impact in impacts] == [
+        ("todos", "SHARE UPDATE EXCLUSIVE", 0),
+        # Created by the same upgrade, so not counted
+        ("new_table", "none", None),
+        ("new_table", "ACCESS EXCLUSIVE", None),
+    ]
+    assert {impact.revision for impact in impacts} == {"530aba752f1f"}
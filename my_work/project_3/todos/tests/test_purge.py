@@ -0,0 +1,114 @@
+"""Soft deleted rows, hidden from queries until purged."""
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.datastore import db_models, purge
+from app.datastore.database import INCLUDE_DELETED
+from app.services import todos
+from app.web import api_keys, auth
+
+
+@pytest.fixture
+def user(
+    session_maker: sessionmaker[Session], make_user: Callable[..., db_models.User]
+) -> db_models.User:
+    """A user with three todos, a refresh token and an API key."""
+    user = make_user()
+    with session_maker() as db:
+        db.add_all(todos.new_todo(user, f"todo {index}") for index in range(3))
+        auth.create_tokens(user, db)
+        api_keys.create_api_key(db, user_id=user.id, name="key")
+        db.commit()
+    return user
+
+
+def _soft_delete(
+    session_maker: sessionmaker[Session], model: type[Any], row_id: int
+) -> None:
+    with session_maker() as db:
+        db.get(model, row_id).soft_delete()
+        db.commit()
+
+
+def _count_rows(engine: Engine, model: type[Any]) -> int:
+    with engine.connect() as connection:
+        return connection.scalar(select(func.count()).select_from(model))
+
+
+def test_soft_deleted_todo_hidden(
+    session_maker: sessionmaker[Session], user: db_models.User
+) -> None:
+    _soft_delete(session_maker, db_models.Todo, 1)
+
+    with session_maker() as db:
+        visible = db.scalars(select(db_models.Todo.id)).all()
+        included = db.scalars(
+            select(db_models.Todo.id).execution_options(**{INCLUDE_DELETED: True})
+        ).all()
+        loaded = db.get(db_models.User, user.id).todos
+
+    assert sorted(visible) == [2, 3]
+    assert sorted(included) == [1, 2, 3]
+    # The criteria carry over to relationships
+    assert sorted(todo.id for todo in loaded) == [2, 3]
+
+
+def test_soft_deleted_user_hidden(
+    session_maker: sessionmaker[Session], user: db_models.User
+) -> None:
+    _soft_delete(session_maker, db_models.User, user.id)
+
+    with session_maker() as db:
+        assert db.get(db_models.User, user.id) is None
+        assert db.query(db_models.User).count() == 0
+        included = db.scalars(
+            select(db_models.User).execution_options(**{INCLUDE_DELETED: True})
+        ).all()
+    assert [included_user.id for included_user in included] == [user.id]
+
+
+def test_purge_removes_todos_before_their_user(
+    engine: Engine, session_maker: sessionmaker[Session], user: db_models.User
+) -> None:
+    _soft_delete(session_maker, db_models.Todo, 1)
+    _soft_delete(session_maker, db_models.User, user.id)
+    deleted_tables: list[list[str]] = []
+
+    def record(*args: Any) -> None:
+        statement = args[2]
+        if statement.startswith("DELETE FROM"):
+            deleted_tables[-1].append(statement.split()[2])
+
+    event.listen(engine, "before_cursor_execute", record)
+    rows = []
+    while True:
+        deleted_tables.append([])
+        with session_maker() as db:
+            rows.append(purge.purge_batch(db, batch_size=1))
+            db.commit()
+        if not rows[-1]:
+            break
+    event.remove(engine, "before_cursor_execute", record)
+
+    # The soft deleted todo, then the user's other todos one per batch, then
+    # the user with their tokens and keys
+    assert rows == [1, 1, 1, 1, 0]
+    assert deleted_tables == [
+        ["todos"],
+        ["todos"],
+        ["todos"],
+        ["refresh_tokens", "api_keys", "users"],
+        [],
+    ]
+    for model in (
+        db_models.Todo,
+        db_models.User,
+        db_models.RefreshToken,
+        db_models.ApiKey,
+    ):
+        assert _count_rows(engine, model) == 0
@@ -0,0 +1,103 @@
+"""Login rate limits, and the API's error responses."""
+import asyncio
+from collections.abc import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.datastore import db_models
+from app.web import auth, errors, rate_limit
+
+
+@pytest.fixture(autouse=True)
+def cheap_hashes(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Verify passwords against cheap hashes, keeping many logins fast."""
+    context = auth.create_password_context(bcrypt_rounds=4)
+    dummy_hash = context.hash("dummy")
+    monkeypatch.setattr(auth, "get_password_context", lambda: context)
+    monkeypatch.setattr(auth, "get_dummy_password_hash", lambda: dummy_hash)
+
+
+def _login(client: TestClient, username: str) -> int:
+    response = client.post(
+        "/api/auth/token", data={"username": username, "password": "wrong"}
+    )
+    if response.status_code == 429:
+        assert response.json() == {"detail": errors.TooManyRequestsError.detail}
+        assert int(response.headers["Retry-After"]) >= 1
+    return response.status_code
+
+
+def test_username_bucket_limits_logins(client: TestClient) -> None:
+    capacity = rate_limit.USERNAME_LOGIN_LIMIT.capacity
+
+    statuses = [_login(client, "Alice") for _ in range(capacity)]
+
+    assert statuses == [401] * capacity
+    # Usernames are limited case insensitively
+    assert _login(client, "alice") == 429
+    assert _login(client, "bob") == 401
+
+
+def test_ip_bucket_limits_logins(client: TestClient) -> None:
+    capacity = rate_limit.IP_LOGIN_LIMIT.capacity
+
+    statuses = [_login(client, f"user{i}") for i in range(capacity)]
+
+    assert statuses == [401] * capacity
+    assert _login(client, "another-user") == 429
+
+
+def test_retry_after_rounds_up_time_to_next_token() -> None:
+    backend = rate_limit.InMemoryRateLimitBackend()
+    limit = rate_limit.RateLimit(capacity=1, per_seconds=90)
+
+    assert asyncio.run(backend.acquire("key", limit)) == 0
+    retry_after = asyncio.run(backend.acquire("key", limit))
+
+    assert 89 < retry_after <= 90
+    error = errors.TooManyRequestsError(retry_after=retry_after)
+    assert error.headers == {"Retry-After": "90"}
+
+
+def test_saturated_hasher_sheds_load(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # No free slots, as if every verification was already in use
+    monkeypatch.setattr(
+        rate_limit, "password_verification_semaphore", asyncio.Semaphore(0)
+    )
+
+    response = client.post(
+        "/api/auth/token", data={"username": "alice", "password": "wrong"}
+    )
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(rate_limit.BUSY_RETRY_AFTER)
+
+
+def test_login_releases_hasher_slot(client: TestClient) -> None:
+    semaphore = rate_limit.password_verification_semaphore
+    free_slots = semaphore._value
+
+    assert _login(client, "alice") == 401
+
+    assert semaphore._value == free_slots
+
+
+def test_api_errors_are_json(
+    client: TestClient,
+    make_user: Callable[..., db_models.User],
+    bearer_headers: Callable[[db_models.User], dict[str, str]],
+) -> None:
+    headers = bearer_headers(make_user())
+
+    not_found = client.get("/api/todos/999", headers=headers)
+    unauthorized = client.get(
+        "/api/todos", headers={"Authorization": "Bearer not-a-token"}
+    )
+
+    assert not_found.status_code == 404
+    assert not_found.json() == {"detail": errors.TodoNotFoundError.detail}
+    assert unauthorized.status_code == 401
+    assert unauthorized.json() == {"detail": errors.UserNotValidatedError.detail}
@@ -0,0 +1,96 @@
+"""Rotating refresh tokens, and detecting their reuse."""
+import asyncio
+from collections.abc import Callable
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.datastore import db_models
+from app.web import auth, errors, refresh_tokens, web_models
+
+
+@pytest.fixture
+def token(
+    session_maker: sessionmaker[Session], make_user: Callable[..., db_models.User]
+) -> web_models.Token:
+    """Tokens of a new session of a new user."""
+    user = make_user()
+    with session_maker() as db:
+        token = auth.create_tokens(user, db)
+        db.commit()
+    return token
+
+
+def _refresh(client: TestClient, refresh_token: str | None) -> tuple[int, dict]:
+    response = client.post("/api/auth/refresh", data={"refresh_token": refresh_token})
+    return response.status_code, response.json()
+
+
+def _todos_status(client: TestClient, access_token: str) -> int:
+    response = client.get(
+        "/api/todos", headers={"Authorization": f"Bearer {access_token}"}
+    )
+    return response.status_code
+
+
+def test_refresh_token_rotated_once(
+    client: TestClient, token: web_models.Token
+) -> None:
+    status_code, new_token = _refresh(client, token.refresh_token)
+    assert status_code == 200
+    assert new_token["refresh_token"] != token.refresh_token
+    assert _todos_status(client, new_token["access_token"]) == 200
+
+    # Replayed within the grace period, e.g. by a concurrent request
+    status_code, body = _refresh(client, token.refresh_token)
+    assert status_code == 409
+    assert body["detail"] == errors.RefreshTokenInUseError.detail
+
+    status_code, _ = _refresh(client, new_token["refresh_token"])
+    assert status_code == 200
+
+
+def test_replay_after_grace_revokes_family(
+    client: TestClient,
+    token: web_models.Token,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(refresh_tokens, "REUSE_GRACE_PERIOD", timedelta(0))
+    _, new_token = _refresh(client, token.refresh_token)
+
+    status_code, _ = _refresh(client, token.refresh_token)
+
+    assert status_code == 401
+    # The successor, and the family's access tokens, are revoked too
+    assert _refresh(client, new_token["refresh_token"])[0] == 401
+    assert _todos_status(client, new_token["access_token"]) == 401
+    assert _todos_status(client, token.access_token) == 401
+
+
+def test_concurrent_claim_in_use(
+    session_maker: sessionmaker[Session],
+    token: web_models.Token,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Without a grace period, only the claim can tell the token is in use
+    monkeypatch.setattr(refresh_tokens, "REUSE_GRACE_PERIOD", timedelta(0))
+
+    async def refresh_concurrently() -> None:
+        with session_maker() as first_db, session_maker() as second_db:
+            # Both requests read the unused token before either claims it
+            loaded = [
+                db.query(db_models.RefreshToken).all() for db in (first_db, second_db)
+            ]
+            assert all(tokens[0].used_at is None for tokens in loaded)
+            await refresh_tokens.rotate_refresh_token(
+                first_db, token.refresh_token or "", auth.TOKEN_EXPIRATION
+            )
+            first_db.commit()
+            await refresh_tokens.rotate_refresh_token(
+                second_db, token.refresh_token or "", auth.TOKEN_EXPIRATION
+            )
+
+    with pytest.raises(errors.RefreshTokenInUseError):
+        asyncio.run(refresh_concurrently())
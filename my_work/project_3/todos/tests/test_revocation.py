@@ -0,0 +1,99 @@
+"""The bloom filtered revocation store."""
+import asyncio
+import time
+
+from app.web import revocation
+
+
+class CountingStore(revocation.RevocationStore):
+    """Stands in for a store shared between workers, counting its lookups."""
+
+    def __init__(self) -> None:
+        self.store = revocation.InMemoryRevocationStore()
+        self.lookups = 0
+
+    async def revoke_user(self, user_id: int, ttl: float) -> None:
+        await self.store.revoke_user(user_id, ttl)
+
+    async def is_user_revoked(self, user_id: int, issued_at: float) -> bool:
+        self.lookups += 1
+        return await self.store.is_user_revoked(user_id, issued_at)
+
+    async def revoke_token(self, token_id: str, expires_at: float) -> None:
+        await self.store.revoke_token(token_id, expires_at)
+
+    async def is_token_revoked(self, token_id: str) -> bool:
+        self.lookups += 1
+        return await self.store.is_token_revoked(token_id)
+
+    async def get_revoked_token_ids(self) -> list[str]:
+        return await self.store.get_revoked_token_ids()
+
+    async def get_revoked_user_ids(self) -> list[int]:
+        return await self.store.get_revoked_user_ids()
+
+    async def compact(self) -> None:
+        await self.store.compact()
+
+
+def test_unrevoked_checks_skip_the_backend() -> None:
+    backend = CountingStore()
+    store = revocation.BloomFilteredRevocationStore(backend)
+
+    async def check() -> tuple[bool, bool]:
+        await store.revoke_user(1, ttl=60)
+        await store.revoke_token("revoked", expires_at=time.time() + 60)
+        return (
+            await store.is_user_revoked(2, issued_at=time.time()),
+            await store.is_token_revoked("not-revoked"),
+        )
+
+    assert asyncio.run(check()) == (False, False)
+    assert backend.lookups == 0
+
+
+def test_revoked_checks_use_the_backend() -> None:
+    store = revocation.BloomFilteredRevocationStore(CountingStore())
+
+    async def check() -> tuple[bool, bool, bool]:
+        issued_at = time.time()
+        await store.revoke_user(1, ttl=60)
+        await store.revoke_token("revoked", expires_at=time.time() + 60)
+        return (
+            await store.is_user_revoked(1, issued_at=issued_at),
+            await store.is_user_revoked(1, issued_at=time.time() + 1),
+            await store.is_token_revoked("revoked"),
+        )
+
+    assert asyncio.run(check()) == (True, False, True)
+
+
+def test_other_workers_revocations_seen_after_refresh() -> None:
+    backend = CountingStore()
+    this_worker = revocation.BloomFilteredRevocationStore(backend)
+    other_worker = revocation.BloomFilteredRevocationStore(backend)
+    assert other_worker.refresh_interval == revocation.SHARED_FILTER_REFRESH_SECONDS
+
+    async def check() -> list[bool]:
+        issued_at = time.time()
+        await this_worker.revoke_user(1, ttl=60)
+        await this_worker.revoke_token("revoked", expires_at=time.time() + 60)
+        before = [
+            await other_worker.is_user_revoked(1, issued_at=issued_at),
+            await other_worker.is_token_revoked("revoked"),
+        ]
+        other_worker.refreshed_at -= other_worker.refresh_interval
+        return before + [
+            await other_worker.is_user_revoked(1, issued_at=issued_at),
+            await other_worker.is_token_revoked("revoked"),
+        ]
+
+    assert asyncio.run(check()) == [False, False, True, True]
+
+
+def test_in_memory_store_refreshes_at_compaction() -> None:
+    store = revocation.BloomFilteredRevocationStore(
+        revocation.InMemoryRevocationStore()
+    )
+
+    assert store.refresh_interval == revocation.COMPACTION_INTERVAL
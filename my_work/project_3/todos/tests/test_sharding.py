@@ -0,0 +1,171 @@
+"""Todos sharded across two SQLite databases."""
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+from sqlalchemy import and_, or_, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.datastore import database, db_models, sharding
+from app.services import todos
+
+SHARD_NAMES = ["shard-0", "shard-1"]
+OWNERS = 6
+TODOS_PER_OWNER = 3
+
+
+@pytest.fixture
+def shard_engines(tmp_path: Path) -> Iterator[dict[str, Engine]]:
+    engines = {
+        name: database._create_engine(f"sqlite:///{tmp_path / f'{name}.db'}")
+        for name in SHARD_NAMES
+    }
+    sharding.create_shard_tables(engines)
+    yield engines
+    for shard_engine in engines.values():
+        shard_engine.dispose()
+
+
+@pytest.fixture
+def sharded_session_maker(
+    engine: Engine, shard_engines: dict[str, Engine]
+) -> sessionmaker[Session]:
+    return sharding.create_sharded_sessionmaker(engine, shard_engines)
+
+
+@pytest.fixture
+def owner_ids(
+    make_user: Callable[..., db_models.User],
+    sharded_session_maker: sessionmaker[Session],
+) -> list[int]:
+    """Ids of owners with todos, spread over both shards."""
+    owners = [make_user(f"owner{index}") for index in range(OWNERS)]
+    with sharded_session_maker() as db:
+        for owner in owners:
+            for index in range(TODOS_PER_OWNER):
+                db.add(todos.new_todo(owner, f"todo {index}"))
+        db.commit()
+    ring = sharding.ShardRing(SHARD_NAMES)
+    assert {ring.get_shard(owner.id) for owner in owners} == set(SHARD_NAMES)
+    return [owner.id for owner in owners]
+
+
+def _get_shard_owner_ids(shard_engine: Engine) -> list[int]:
+    with shard_engine.connect() as connection:
+        return list(
+            connection.scalars(select(db_models.Todo.__table__.c.owner_id)).all()
+        )
+
+
+def test_todos_stored_on_owners_shard(
+    owner_ids: list[int], shard_engines: dict[str, Engine]
+) -> None:
+    ring = sharding.ShardRing(SHARD_NAMES)
+    for name, shard_engine in shard_engines.items():
+        shard_owner_ids = _get_shard_owner_ids(shard_engine)
+        assert shard_owner_ids
+        assert all(ring.get_shard(owner_id) == name for owner_id in shard_owner_ids)
+
+
+def test_owner_query_reads_owners_todos(
+    owner_ids: list[int], sharded_session_maker: sessionmaker[Session]
+) -> None:
+    with sharded_session_maker() as db:
+        for owner_id in owner_ids:
+            owned = (
+                db.query(db_models.Todo)
+                .filter(db_models.Todo.owner_id == owner_id)
+                .all()
+            )
+            assert len(owned) == TODOS_PER_OWNER
+            assert {todo.owner_id for todo in owned} == {owner_id}
+
+
+def test_admin_query_fans_out_to_every_shard(
+    owner_ids: list[int], sharded_session_maker: sessionmaker[Session]
+) -> None:
+    with sharded_session_maker() as db:
+        all_todos = db.query(db_models.Todo).all()
+
+    assert len(all_todos) == OWNERS * TODOS_PER_OWNER
+    assert {todo.owner_id for todo in all_todos} == set(owner_ids)
+
+
+def test_todos_page_merges_shards(
+    owner_ids: list[int], sharded_session_maker: sessionmaker[Session]
+) -> None:
+    with sharded_session_maker() as db:
+        expected_ids = sorted(todo.id for todo in db.query(db_models.Todo).all())
+        paged_ids: list[int] = []
+        after_id = 0
+        while page := todos.get_todos_page(db, after_id=after_id, limit=4):
+            assert len(page) <= 4
+            paged_ids.extend(todo.id for todo in page)
+            after_id = page[-1].id
+
+    assert paged_ids == expected_ids
+    assert len(set(paged_ids)) == OWNERS * TODOS_PER_OWNER
+
+
+def test_or_query_reads_every_shard(
+    owner_ids: list[int],
+    shard_engines: dict[str, Engine],
+    sharded_session_maker: sessionmaker[Session],
+) -> None:
+    ring = sharding.ShardRing(SHARD_NAMES)
+    owner_id = owner_ids[0]
+    other_owner_id = next(
+        other_id
+        for other_id in owner_ids
+        if ring.get_shard(other_id) != ring.get_shard(owner_id)
+    )
+    with sharded_session_maker() as db:
+        other_todo_id = (
+            db.query(db_models.Todo.id)
+            .filter(db_models.Todo.owner_id == other_owner_id)
+            .limit(1)
+            .scalar()
+        )
+        matched = (
+            db.query(db_models.Todo)
+            .filter(
+                or_(
+                    db_models.Todo.owner_id == owner_id,
+                    db_models.Todo.id == other_todo_id,
+                )
+            )
+            .all()
+        )
+
+    assert len(matched) == TODOS_PER_OWNER + 1
+    assert {todo.owner_id for todo in matched} == {owner_id, other_owner_id}
+
+
+@pytest.mark.parametrize(
+    "criteria, owner_ids",
+    [
+        ((db_models.Todo.owner_id == 1,), [1]),
+        ((db_models.Todo.owner_id.in_([1, 2]),), [1, 2]),
+        ((db_models.Todo.owner_id == 1, db_models.Todo.id == 5), [1]),
+        ((and_(db_models.Todo.id > 5, db_models.Todo.owner_id == 1),), [1]),
+        (
+            (
+                db_models.Todo.owner_id == 1,
+                or_(db_models.Todo.completed, db_models.Todo.id == 5),
+            ),
+            [1],
+        ),
+        ((or_(db_models.Todo.owner_id == 1, db_models.Todo.id == 5),), None),
+        ((or_(db_models.Todo.owner_id == 1, db_models.Todo.owner_id == 2),), None),
+        ((db_models.Todo.id == 5,), None),
+        ((), None),
+    ],
+)
+def test_owner_ids_only_narrowed_by_conjuncts(
+    criteria: tuple[Any, ...], owner_ids: list[int] | None
+) -> None:
+    statement = select(db_models.Todo).where(*criteria)
+
+    assert sharding._get_owner_ids(statement) == owner_ids